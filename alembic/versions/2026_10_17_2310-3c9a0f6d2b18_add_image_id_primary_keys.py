@@ -0,0 +1,38 @@
+"""add image_id primary keys
+
+Revision ID: 3c9a0f6d2b18
+Revises: b7f3e1a95c46
+Create Date: 2026-10-17 23:10:27.551904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a0f6d2b18'
+down_revision: Union[str, Sequence[str], None] = 'b7f3e1a95c46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ключи изображений становятся хешами содержимого и перестают быть уникальными
+    for table in ('post_images', 'user_images'):
+        op.add_column(table, sa.Column('image_id', sa.UUID(), server_default=sa.text('uuidv7()'), nullable=False))
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.create_primary_key(f'{table}_pkey', table, ['image_id'])
+        op.create_index(op.f(f'ix_{table}_image_key'), table, ['image_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # не выполнится, если один ключ уже используется несколькими записями
+    for table in ('user_images', 'post_images'):
+        op.drop_index(op.f(f'ix_{table}_image_key'), table_name=table)
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.create_primary_key(f'{table}_pkey', table, ['image_key'])
+        op.drop_column(table, 'image_id')
@@ -1,10 +1,14 @@
-from datetime import datetime
+from datetime import datetime, UTC
 
-from sqlalchemy import select
+import jwt
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.auth.utils_jwt import decode_jwt
-from app.models import JWTSession
+from app.models import JWTSession, db_helper
+
+PURGE_BATCH_SIZE = 1000
 
 
 async def create_jwt_session(
@@ -12,19 +16,29 @@ async def create_jwt_session(
     refresh_token,
     session: AsyncSession,
 ):
+    """
+    Сохраняет refresh-сессию пользователя одним запросом: у пользователя одна сессия,
+    и при повторном входе предыдущая заменяется новой. Время хранится в UTC без
+    часового пояса, с ним же сравнивает purge_expired_jwt_sessions.
+    """
     refresh_payload = decode_jwt(refresh_token, options={"verify_signature": False})
-    new_jwt_session = JWTSession(
+    statement = insert(JWTSession).values(
         user_id=user.user_id,
         token=refresh_token,
-        created_at=datetime.now(),
+        created_at=datetime.now(UTC).replace(tzinfo=None),
         token_id=refresh_payload.get("jti"),
-        expires_in=datetime.fromtimestamp(refresh_payload.get("exp")),
+        expires_in=datetime.fromtimestamp(refresh_payload.get("exp"), UTC).replace(tzinfo=None),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[JWTSession.user_id],
+        set_={
+            "token": statement.excluded.token,
+            "created_at": statement.excluded.created_at,
+            "token_id": statement.excluded.token_id,
+            "expires_in": statement.excluded.expires_in,
+        },
     )
-    statement = select(JWTSession).where(JWTSession.user_id == user.user_id)
-    if current_refresh_session := await session.scalar(statement):
-        await session.delete(current_refresh_session)
-        await session.commit()
-    session.add(new_jwt_session)
+    await session.execute(statement)
     await session.commit()
     return await session.close()
 
@@ -34,19 +48,32 @@ async def update_jwt_session(
     request,
     session: AsyncSession,
 ):
+    """
+    Ротация refresh-токена одним условным UPDATE: сессия обновляется, только если
+    текущий токен из cookie еще не был заменен.
+    :raise jwt.InvalidTokenError: если сессии с текущим токеном нет
+    """
     current_token = request.cookies.get("refresh_token")
     current_refresh_payload = decode_jwt(current_token)
     current_token_id = current_refresh_payload.get("jti")
-    statement = select(JWTSession).where(JWTSession.token_id == current_token_id)
-    # возможно стоит сделать индекс на JWTSession.token_id для ускорения поиска
-    if current_jwt_session := await session.scalar(statement):
-        new_refresh_payload = decode_jwt(refresh, options={"verify_signature": False})
-        current_jwt_session.token = refresh
-        current_jwt_session.created_at = datetime.now()
-        current_jwt_session.token_id = new_refresh_payload.get("jti")
-        current_jwt_session.expires_in = datetime.fromtimestamp(new_refresh_payload.get("exp"))
-        session.add(current_jwt_session)
-        await session.commit()
+    new_refresh_payload = decode_jwt(refresh, options={"verify_signature": False})
+    statement = (
+        update(JWTSession)
+        .where(JWTSession.token_id == current_token_id)
+        .values(
+            token=refresh,
+            created_at=datetime.now(UTC).replace(tzinfo=None),
+            token_id=new_refresh_payload.get("jti"),
+            expires_in=datetime.fromtimestamp(new_refresh_payload.get("exp"), UTC).replace(tzinfo=None),
+        )
+        .returning(JWTSession.id)
+        .execution_options(synchronize_session=False)
+    )
+    if await session.scalar(statement) is None:
+        await session.rollback()
+        msg = "refresh session not found"
+        raise jwt.InvalidTokenError(msg)
+    await session.commit()
 
 
 async def delete_jwt_session(
@@ -56,8 +83,35 @@ async def delete_jwt_session(
     current_token = request.cookies.get("refresh_token")
     current_refresh_payload = decode_jwt(current_token)
     current_token_id = current_refresh_payload.get("jti")
-    statement = select(JWTSession).where(JWTSession.token_id == current_token_id)
-    # возможно стоит сделать индекс на JWTSession.token_id для ускорения поиска
-    if current_refresh_session := await session.scalar(statement):
-        await session.delete(current_refresh_session)
-        await session.commit()
+    statement = delete(JWTSession).where(JWTSession.token_id == current_token_id)
+    await session.execute(statement)
+    await session.commit()
+
+
+async def purge_expired_jwt_sessions(batch_size: int = PURGE_BATCH_SIZE) -> str:
+    """
+    Удаляет сессии с истекшим refresh-токеном пачками по batch_size строк, каждая пачка
+    в своей транзакции: блокировки держатся недолго, и WAL не разрастается.
+    Строки, заблокированные входом или обновлением токена, пропускаются до следующего запуска.
+    """
+    now = datetime.now(UTC).replace(tzinfo=None)
+    total = 0
+    async with db_helper.session_factory() as session:
+        while True:
+            expired_ids = (
+                select(JWTSession.id)
+                .where(JWTSession.expires_in < now)
+                .order_by(JWTSession.expires_in)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            result = await session.execute(
+                delete(JWTSession)
+                .where(JWTSession.id.in_(expired_ids.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+    return f"Purged {total} expired jwt sessions"
@@ -4,12 +4,15 @@ from argon2.exceptions import VerifyMismatchError
 from fastapi import Form, HTTPException, Request, status, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.users.crud import get_user_by_login, get_user
+from app.api.users.crud import get_user_by_login
+from app.api.auth.rate_limit import client_ip, login_rate_limiter
 from app.api.auth.utils_jwt import validate_password, decode_jwt
 from app.models import User, db_helper
+from app.services.user_cache import get_user
 
 
 async def validate_auth_user(
+    request: Request,
     login=Form(),
     password=Form(),
     session: AsyncSession = Depends(db_helper.scoped_session_dependency),
@@ -18,10 +21,12 @@ async def validate_auth_user(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="invalid login or password",
     )
+    # ограничение проверяется до поиска пользователя и расчета хеша пароля
+    await login_rate_limiter.check(login, client_ip(request))
     if not (user := await get_user_by_login(login, session=session)):
         raise unauthed_exc
     try:
-        if not validate_password(
+        if not await validate_password(
             password=password,
             hashed_password=user.password,
         ):
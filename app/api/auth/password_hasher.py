@@ -0,0 +1,87 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from argon2 import PasswordHasher
+from fastapi import HTTPException, status
+
+from app.settings import settings
+
+
+class PasswordHashExecutor:
+    """
+    Выполняет хеширование и проверку паролей Argon2 в ограниченном пуле потоков,
+    чтобы расчет хеша не блокировал event loop. argon2-cffi отпускает GIL на время
+    расчета, поэтому потоки работают параллельно.
+    Одновременно выполняется не больше concurrency операций, остальные ждут в очереди.
+    Если в очереди уже max_queue операций, новые отклоняются с 503 (0 - без ограничения).
+    """
+
+    def __init__(self, concurrency: int, max_queue: int = 0):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._hasher = PasswordHasher()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="argon2")
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._pending - self.concurrency, 0)
+
+    async def _run(self, func, *args):
+        if self.max_queue and self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="too many authentication requests, try again later",
+                headers={"Retry-After": "1"},
+            )
+        submitted_at = time.perf_counter()
+
+        def call():
+            return time.perf_counter(), func(*args)
+
+        self._pending += 1
+        try:
+            started_at, result = await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            self._pending -= 1
+        wait_time = started_at - submitted_at
+        self.completed += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hasher.hash, password)
+
+    async def verify(self, hashed_password: str, password: str) -> bool:
+        """
+        :raise VerifyMismatchError: если пароль не совпадает с хешем
+        """
+        return await self._run(self._hasher.verify, hashed_password, password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.concurrency),
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_time_total / self.completed * 1000, 3) if self.completed else 0.0,
+            "max_wait_ms": round(self.wait_time_max * 1000, 3),
+        }
+
+
+password_hasher = PasswordHashExecutor(
+    concurrency=settings.password_hash_concurrency,
+    max_queue=settings.password_hash_max_queue,
+)
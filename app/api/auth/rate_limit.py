@@ -0,0 +1,130 @@
+import hashlib
+import logging
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from app.conf.redis_client import get_redis_client
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Token bucket для нескольких ключей за один вызов: попытка разрешена, только если
+# токен есть в каждой корзине, тогда из каждой списывается по токену. Время берется
+# из Redis, поэтому часы воркеров не влияют на расчет.
+# KEYS - корзины, ARGV - пары (емкость, пополнение в секунду) для каждой корзины.
+# Возвращает 0 или число секунд до следующей разрешенной попытки.
+RATE_LIMIT_SCRIPT = """
+local now = redis.call('TIME')
+local t = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local tokens = {}
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or t
+    available = math.min(capacity, available + math.max(0, t - ts) * rate)
+    if available < 1 then
+        retry_after = math.max(retry_after, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local available = tokens[i]
+    if retry_after == 0 then
+        available = available - 1
+    end
+    redis.call('HSET', key, 'tokens', available, 'ts', t)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return math.ceil(retry_after)
+"""
+
+TRUSTED_PROXIES = tuple(ip_network(proxy, strict=False) for proxy in settings.trusted_proxies)
+
+
+def _is_trusted(address: str, trusted_proxies) -> bool:
+    try:
+        ip = ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_ip(
+    request: Request,
+    trusted_proxies: tuple[IPv4Network | IPv6Network, ...] = TRUSTED_PROXIES,
+) -> str:
+    """
+    IP клиента для ограничения попыток входа. За обратным прокси (Caddy) соединение
+    приходит с адреса прокси, поэтому для доверенных прокси (TRUSTED_PROXIES) берется
+    последний адрес из X-Forwarded-For, не принадлежащий доверенным прокси.
+    Адреса левее него добавлены клиентом и могут быть подделаны.
+    """
+    if request.client is None:
+        return "unknown"
+    host = request.client.host
+    if not _is_trusted(host, trusted_proxies):
+        return host
+    forwarded = [
+        address.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for address in header.split(",")
+        if address.strip()
+    ]
+    for address in reversed(forwarded):
+        if not _is_trusted(address, trusted_proxies):
+            return address
+    return host
+
+
+class LoginRateLimiter:
+    """
+    Ограничивает попытки входа до проверки пароля, чтобы перебор паролей не занимал
+    процессор расчетом Argon2. Отдельные корзины по логину и по IP клиента хранятся
+    в Redis и общие для всех воркеров. Проверка стоит одного запроса к Redis.
+    Если Redis недоступен, попытка пропускается.
+    """
+
+    def __init__(self, login_burst: int, login_per_minute: float, ip_burst: int, ip_per_minute: float):
+        self._limits = (
+            login_burst, login_per_minute / 60,
+            ip_burst, ip_per_minute / 60,
+        )
+        self._script = None
+
+    @staticmethod
+    def _keys(login: str, client_ip: str) -> list[str]:
+        login_digest = hashlib.sha256(login.strip().lower().encode()).hexdigest()[:32]
+        return [f"login_limit:login:{login_digest}", f"login_limit:ip:{client_ip}"]
+
+    async def check(self, login: str, client_ip: str) -> None:
+        """
+        :raise HTTPException: 429 с заголовком Retry-After, если попытки исчерпаны
+        """
+        if self._script is None:
+            self._script = get_redis_client().register_script(RATE_LIMIT_SCRIPT)
+        try:
+            retry_after = await self._script(keys=self._keys(login, client_ip), args=self._limits)
+        except RedisError as e:
+            logger.warning("login rate limit check failed: %s", e)
+            return
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="too many login attempts",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+
+login_rate_limiter = LoginRateLimiter(
+    login_burst=settings.login_rate_limit_login_burst,
+    login_per_minute=settings.login_rate_limit_login_per_minute,
+    ip_burst=settings.login_rate_limit_ip_burst,
+    ip_per_minute=settings.login_rate_limit_ip_per_minute,
+)
@@ -0,0 +1,75 @@
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+
+from app.settings import settings
+
+
+class VerifiedTokenCache:
+    """
+    Ограниченный LRU-кэш проверенных access-токенов: для уже проверенного токена
+    middleware не повторяет проверку подписи и разбор claims.
+    Ключ - SHA-256 токена, сам токен в памяти не хранится. Запись удаляется по
+    истечении срока действия токена (claim exp).
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, tuple[uuid.UUID, str | None, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> tuple[uuid.UUID, str | None] | None:
+        """
+        Возвращает (user_id, role) проверенного токена или None, если токена нет в кэше
+        или срок его действия истек.
+        """
+        if not self.maxsize:
+            self.misses += 1
+            return None
+        key = self._digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        user_id, role, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return user_id, role
+
+    def put(self, token: str, user_id: uuid.UUID, role: str | None, expires_at: float) -> None:
+        if not self.maxsize:
+            return
+        key = self._digest(token)
+        self._entries[key] = (user_id, role, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(maxsize=settings.auth_token_cache_size)
@@ -1,13 +1,10 @@
-import os
 import uuid
 from datetime import datetime, timedelta, UTC
 
-from argon2 import PasswordHasher
 import jwt
-from dotenv import load_dotenv
 
-
-load_dotenv()
+from app.api.auth.password_hasher import password_hasher
+from app.settings import settings
 
 
 def encode_jwt(
@@ -18,7 +15,7 @@ def encode_jwt(
     encoded = jwt.encode(
         headers=token_type_header,
         payload=payload,
-        key=os.getenv("SECRET_KEY"),
+        key=settings.secret_key,
         algorithm="HS256",
     )
     return encoded
@@ -30,7 +27,7 @@ def decode_jwt(
 ):
     decoded = jwt.decode(
         token,
-        key=os.getenv("SECRET_KEY"),
+        key=settings.secret_key,
         algorithms="HS256",
         options=options,
     )
@@ -41,7 +38,7 @@ def create_access_token(user):
     payload = {
         "sub": str(user.user_id),
         "role": user.role,
-        "exp": datetime.now(UTC) + timedelta(minutes=int(os.getenv("ACCESS_TOKEN_EXPIRE"))),
+        "exp": datetime.now(UTC) + timedelta(minutes=settings.access_token_expire),
     }
     return encode_jwt("access", payload)
 
@@ -50,11 +47,41 @@ def create_refresh_token(user):
     payload = {
         "sub": str(user.user_id),
         "jti": str(uuid.uuid4()),
-        "exp": datetime.now(UTC) + timedelta(days=int(os.getenv("REFRESH_TOKEN_EXPIRE"))),
+        "exp": datetime.now(UTC) + timedelta(days=settings.refresh_token_expire),
     }
     return encode_jwt("refresh", payload)
 
 
+def create_upload_token(user_id, bucket_name, key, entity_id):
+    """
+    Подписывает выданный клиенту ключ загрузки, чтобы при подтверждении нельзя было
+    привязать чужой объект. В токене нет "sub", поэтому как токен доступа он не принимается.
+    :param user_id: пользователь, получивший политику загрузки
+    :param bucket_name: бакет, в который загружается файл
+    :param key: ключ объекта в бакете
+    :param entity_id: публикация или пользователь, к которому относится изображение
+    :return: токен загрузки
+    """
+    payload = {
+        "uid": str(user_id),
+        "bucket": bucket_name,
+        "key": key,
+        "ref": str(entity_id),
+        "exp": datetime.now(UTC) + timedelta(seconds=settings.upload_token_expire),
+    }
+    return encode_jwt("upload", payload)
+
+
+def decode_upload_token(token: str) -> dict:
+    """
+    :raise jwt.InvalidTokenError: если подпись неверна, срок истек или это не токен загрузки
+    """
+    if jwt.get_unverified_header(token).get("type") != "upload":
+        msg = "not an upload token"
+        raise jwt.InvalidTokenError(msg)
+    return decode_jwt(token)
+
+
 def set_refresh_to_cookie(
     refresh,
     response,
@@ -75,20 +102,17 @@ def delete_refresh_from_cookie(response):
     )
 
 
-ph = PasswordHasher()
-
-
-def hash_password(
+async def hash_password(
     password: str,
 ):
-    return ph.hash(password)
+    return await password_hasher.hash(password)
 
 
-def validate_password(
+async def validate_password(
     password,
     hashed_password,
 ):
-    return ph.verify(
+    return await password_hasher.verify(
         hashed_password,
         password,
     )
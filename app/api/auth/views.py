@@ -26,6 +26,7 @@ async def get_my_profile(
 ):
     if user.profile_image:
         storage = S3ImageManager("users-avatar-images", client)
+        user.profile_image_srcset = await storage.generate_srcset(getattr(user, "profile_image_variants", None))
         user.profile_image = await storage.generate_url(user.profile_image)
     return user
 
@@ -47,15 +48,12 @@ async def register_author(
         if user_in.profile_image:
             new_author.profile_image = new_author.image.image_url
         return new_author
-    # TODO: нужно ли это здесь, если и да, то ролбекать нужно и созданное изображение
+    # транзакцию откатывает зависимость сессии, она же удаляет загруженное изображение
     except IntegrityError:
-        await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error when creating a user",
         )
-    finally:
-        await session.close()
 
 
 @router.post("/login", response_model=TokenInfo, status_code=status.HTTP_200_OK)
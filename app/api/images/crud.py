@@ -5,12 +5,34 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import PostImage, Post, AvatarImage, User
 
 
+def image_owner(entity):
+    """
+    Модель записей изображений сущности, столбец владельца в ней, идентификатор владельца
+    и поле сущности с ключом ее изображения.
+    :param entity: публикация или пользователь
+    :raise TypeError: если entity не публикация и не пользователь
+    """
+    if isinstance(entity, Post):
+        return PostImage, PostImage.post_id, entity.post_id, "post_image"
+    if isinstance(entity, User):
+        return AvatarImage, AvatarImage.user_id, entity.user_id, "profile_image"
+    msg = f"Expected User or Post, got {type(entity).__name__}"
+    raise TypeError(msg)
+
+
 async def get_image(
     image_key,
     session,
-    model,
+    entity,
 ):
-    image = await session.get(model, image_key)
+    """
+    Возвращает запись изображения публикации или пользователя. Один ключ может
+    использоваться несколькими записями, поэтому запись ищется вместе с владельцем.
+    """
+    model, owner_column, owner_id, _ = image_owner(entity)
+    image = await session.scalar(
+        select(model).where(model.image_key == image_key, owner_column == owner_id).limit(1)
+    )
     if not image:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -23,12 +45,8 @@ async def save_image(
     session: AsyncSession,
     entity,
 ):
-    if isinstance(entity, Post):
-        image = PostImage(image_key=image_key, post_id=entity.post_id)
-    elif isinstance(entity, User):
-        image = AvatarImage(image_key=image_key, user_id=entity.user_id)
-    else:
-        raise TypeError(f"Expected User or Post, got {type(entity).__name__}")
+    model, owner_column, owner_id, _ = image_owner(entity)
+    image = model(image_key=image_key, **{owner_column.key: owner_id})
     session.add(image)
     return image
 
@@ -36,11 +54,11 @@ async def save_image(
 async def delete_image(
     image_key: str,
     session: AsyncSession,
-    model,
+    entity,
 ):
-    image = await get_image(image_key, session, model)
+    image = await get_image(image_key, session, entity)
     await session.delete(image)
-    await session.commit()
+    await session.flush()
     return image_key
 
 
@@ -1,6 +1,5 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy import select
-from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -9,17 +8,20 @@ from app.models import PostImage, Post, db_helper
 
 async def get_post_by_image_key(
     image_key,
+    request: Request,
     session: AsyncSession = Depends(db_helper.scoped_session_dependency),
 ) -> Post:
+    # один файл может быть в нескольких публикациях, в первую очередь берется публикация автора запроса
     statement = (
         select(PostImage)
+        .join(PostImage.post)
         .where(PostImage.image_key == image_key)
+        .order_by((Post.author_id == request.state.user_id).desc())
+        .limit(1)
         .options(selectinload(PostImage.post))
     )
-    result = await session.execute(statement)
-    try:
-        entity_image = result.scalars().one()
-    except NoResultFound:
+    entity_image = await session.scalar(statement)
+    if entity_image is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="image was not found"
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class UploadUrlRequest(BaseModel):
+    file_name: str
+    content_type: str
+
+
+class UploadUrlResponse(BaseModel):
+    url: str
+    fields: dict[str, str]
+    image_key: str
+    upload_token: str
+    expires_in: int
+
+
+class UploadConfirm(BaseModel):
+    upload_token: str
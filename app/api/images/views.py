@@ -9,9 +9,11 @@ from app.api.images.dependencies import get_post_by_image_key
 from app.api.posts.dependencies import post_by_id
 from app.api.images import permitions as perm
 from app.api.images import crud
+from app.api.images.schemas import UploadUrlRequest, UploadUrlResponse, UploadConfirm
 from app.conf.s3_client import s3client, S3AsyncClient
-from app.models import Post, db_helper, PostImage
+from app.models import Post, db_helper, PostImage, after_commit
 from app.services import image_service, S3ImageManager
+from app.services.image_refs import release_images
 
 router = APIRouter(tags=["Post images"])
 required_auth = HTTPBearer(auto_error=False)
@@ -21,6 +23,7 @@ class ImageResponse(BaseModel):
     image_key: str
     post_id: uuid.UUID
     image_url: str | None = None
+    srcset: str | None = None
 
 
 @router.get(
@@ -46,6 +49,7 @@ async def get_post_images(
     for image in images:
         storage = S3ImageManager("post-illustration-images", client)
         image.image_url = await storage.generate_url(image.image_key)
+        image.srcset = await storage.generate_srcset(image.variants)
     return images
 
 
@@ -83,6 +87,77 @@ async def upload_image(
     )
 
 
+@router.post(
+    "/post/{post_id}/upload_url",
+    response_model=UploadUrlResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_upload_url(
+    post_id: uuid.UUID,
+    request: Request,
+    upload_in: UploadUrlRequest,
+    _creds = Depends(required_auth),
+    post: Post = Depends(post_by_id),
+    client: S3AsyncClient = Depends(s3client.get_client)
+):
+    """
+    Выдает политику для загрузки изображения публикации прямо в хранилище.
+    После загрузки ее нужно подтвердить в /post/{post_id}/confirm_upload.
+    """
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Post by id {post_id} not found",
+        )
+    if perm.authorise_post_content_image_management(post, request):
+        storage = S3ImageManager("post-illustration-images", client)
+        return await image_service.create_upload_url(
+            upload_in.file_name,
+            upload_in.content_type,
+            request.state.user_id,
+            storage,
+            post,
+        )
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="unauthorized",
+    )
+
+
+@router.post(
+    "/post/{post_id}/confirm_upload",
+    response_model=ImageResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def confirm_upload(
+    post_id: uuid.UUID,
+    request: Request,
+    confirm_in: UploadConfirm,
+    _creds = Depends(required_auth),
+    session: AsyncSession = Depends(db_helper.scoped_session_dependency),
+    post: Post = Depends(post_by_id),
+    client: S3AsyncClient = Depends(s3client.get_client)
+):
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Post by id {post_id} not found",
+        )
+    if perm.authorise_post_content_image_management(post, request):
+        storage = S3ImageManager("post-illustration-images", client)
+        return await image_service.confirm_upload(
+            confirm_in.upload_token,
+            request.state.user_id,
+            session,
+            storage,
+            post,
+        )
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="unauthorized",
+    )
+
+
 @router.delete(
     "/post/delete_image/{image_key}",
     status_code=status.HTTP_204_NO_CONTENT,
@@ -97,8 +172,9 @@ async def delete_content_image(
 ):
     if perm.authorise_post_content_image_delete(image_key, post, request):
         storage = S3ImageManager("post-illustration-images", client)
-        await storage.delete_object(image_key)
-        return await crud.delete_image(image_key, session, PostImage)
+        deleted_key = await crud.delete_image(image_key, session, post)
+        after_commit(session, release_images, storage, PostImage, [image_key])
+        return deleted_key
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="unauthorized",
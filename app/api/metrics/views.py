@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.api.auth.password_hasher import password_hasher
+from app.api.auth.token_cache import token_cache
+from app.models import UserRole, db_helper
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+required_auth = HTTPBearer(auto_error=True)
+
+
+@router.get("", status_code=status.HTTP_200_OK)
+async def get_metrics(
+    request: Request,
+    _creds: HTTPAuthorizationCredentials = Depends(required_auth),
+):
+    """
+    Внутренние показатели текущего воркера. Доступно только администратору.
+    """
+    if request.state.user_role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="unauthorized",
+        )
+    return {
+        "auth_token_cache": token_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "db_pool": db_helper.pool_stats(),
+        "db_replicas": db_helper.replica_stats(),
+    }
@@ -1,10 +1,49 @@
 import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime
 
 from fastapi import HTTPException, status, Request
-from sqlalchemy import select
+from sqlalchemy import and_, any_, bindparam, func, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert, websearch_to_tsquery
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
 
-from app.models import Post, PublishStatus
+from app.models import Post, PostTag, PublishStatus, Tag, after_commit
+from app.models.post import SEARCH_CONFIG
+from app.services import post_cache, feed_index
+
+
+def _list_options(summary: bool) -> list:
+    """
+    Опции загрузки постов для списков. В режиме summary из базы не читается
+    содержание поста, которое составляет основной объем строки.
+    """
+    options = [selectinload(Post.pinned_tags), selectinload(Post.cover)]
+    if summary:
+        options.append(
+            load_only(
+                Post.post_id,
+                Post.title,
+                Post.excerpt,
+                Post.author_id,
+                Post.publish_status,
+                Post.post_image,
+                Post.created_at,
+                Post.updated_at,
+                raiseload=True,
+            )
+        )
+    return options
+
+
+def _post_id_in(post_ids: list[uuid.UUID]):
+    """
+    Условие post_id = ANY($1::uuid[]): список передается одним параметром-массивом,
+    поэтому текст запроса (и подготовленный asyncpg запрос) не зависит от длины списка.
+    """
+    return Post.post_id == any_(
+        bindparam("post_ids", post_ids, type_=ARRAY(UUID(as_uuid=True)))
+    )
 
 
 async def get_post(
@@ -12,7 +51,9 @@ async def get_post(
     session: AsyncSession,
     request: Request,
 ) -> Post:
-    post = await session.get(Post, post_id)
+    post = await session.get(
+        Post, post_id, options=[selectinload(Post.pinned_tags), selectinload(Post.cover)]
+    )
     if post:
         return post
     await session.close()
@@ -26,16 +67,181 @@ async def get_filtered_posts(
     session: AsyncSession,
     publish_status: str,
     request: Request,
-) -> list[Post]:
-    filtered_query = select(Post).filter(Post.publish_status == publish_status)
+    limit: int,
+    after: uuid.UUID | None = None,
+    tag: str | None = None,
+    summary: bool = False,
+) -> tuple[list[Post], bool]:
+    """
+    Возвращает страницу публикаций с заданным статусом, от новых к старым.
+    Пагинация по ключу: post_id (uuidv7) упорядочен по времени создания, поэтому
+    следующая страница читается диапазоном индекса (publish_status, post_id).
+    :param after: post_id последней публикации предыдущей страницы
+    :param tag: название тега, которым должны быть отмечены публикации
+    :param summary: загружать только поля для сокращенного представления
+    :return: публикации страницы и признак наличия следующей страницы
+    """
+    filtered_query = (
+        select(Post)
+        .filter(Post.publish_status == publish_status)
+        .options(*_list_options(summary))
+    )
+    if tag is not None:
+        filtered_query = (
+            filtered_query
+            .join(PostTag, PostTag.post_id == Post.post_id)
+            .join(Tag, Tag.tag_id == PostTag.tag_id)
+            .filter(Tag.title == tag.strip().lower())
+        )
     if publish_status != "published":
         if request.state.user_role == "author":
             filtered_query = filtered_query.filter(
                 Post.author_id == request.state.user_id,
             )
+    if after is not None:
+        filtered_query = filtered_query.filter(Post.post_id < after)
+    filtered_query = filtered_query.order_by(Post.post_id.desc()).limit(limit + 1)
     result = await session.execute(filtered_query)
-    posts = result.scalars().all()
-    return list(posts)
+    posts = list(result.scalars().all())
+    return posts[:limit], len(posts) > limit
+
+
+async def search_posts(
+    session: AsyncSession,
+    query: str,
+    request: Request,
+    limit: int,
+    offset: int = 0,
+    summary: bool = False,
+) -> tuple[list[Post], bool]:
+    """
+    Полнотекстовый поиск по заголовку и содержанию через GIN-индекс search_vector.
+    Результаты упорядочены по релевантности, совпадения в заголовке весят больше.
+    Неавторизованным пользователям доступны только опубликованные посты,
+    авторизованным - еще и собственные, кроме архивных (удаленных).
+    :return: публикации страницы и признак наличия следующей страницы
+    """
+    ts_query = websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(Post.search_vector, ts_query)
+    visible = Post.publish_status == PublishStatus.published
+    if request.state.user_id:
+        # архивные (удаленные) посты в поиск не попадают, в том числе у автора
+        visible = or_(
+            visible,
+            and_(
+                Post.author_id == request.state.user_id,
+                Post.publish_status != PublishStatus.archived,
+            ),
+        )
+    statement = (
+        select(Post)
+        .where(Post.search_vector.op("@@")(ts_query), visible)
+        .options(*_list_options(summary))
+        .order_by(rank.desc(), Post.post_id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+    )
+    result = await session.execute(statement)
+    posts = list(result.scalars().all())
+    return posts[:limit], len(posts) > limit
+
+
+async def get_published_posts_by_ids(
+    session: AsyncSession,
+    post_ids: list[uuid.UUID],
+    summary: bool = False,
+) -> list[Post]:
+    """
+    Загружает опубликованные посты одним запросом и возвращает их в порядке post_ids.
+    Посты, которые больше не опубликованы, пропускаются.
+    """
+    if not post_ids:
+        return []
+    statement = (
+        select(Post)
+        .where(
+            _post_id_in(post_ids),
+            Post.publish_status == PublishStatus.published,
+        )
+        .options(*_list_options(summary))
+    )
+    result = await session.execute(statement)
+    posts = {post.post_id: post for post in result.scalars().all()}
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+async def get_posts_by_ids(
+    session: AsyncSession,
+    post_ids: list[uuid.UUID],
+) -> dict[uuid.UUID, Post]:
+    """
+    Загружает посты по списку идентификаторов одним запросом, без учета статуса.
+    :return: найденные посты по post_id
+    """
+    if not post_ids:
+        return {}
+    statement = (
+        select(Post)
+        .where(_post_id_in(post_ids))
+        .options(selectinload(Post.pinned_tags), selectinload(Post.cover))
+    )
+    result = await session.execute(statement)
+    return {post.post_id: post for post in result.scalars().all()}
+
+
+EXPORT_BATCH_SIZE = 500
+
+
+async def stream_posts(
+    session: AsyncSession,
+    publish_status: PublishStatus | None = None,
+    author_id: uuid.UUID | None = None,
+    updated_from: datetime | None = None,
+    updated_to: datetime | None = None,
+) -> AsyncIterator[Post]:
+    """
+    Читает посты через серверный курсор пачками по EXPORT_BATCH_SIZE строк,
+    поэтому потребление памяти не зависит от размера таблицы.
+    """
+    statement = (
+        select(Post)
+        .options(selectinload(Post.pinned_tags), selectinload(Post.cover))
+        .order_by(Post.post_id)
+    )
+    if publish_status is not None:
+        statement = statement.where(Post.publish_status == publish_status)
+    if author_id is not None:
+        statement = statement.where(Post.author_id == author_id)
+    if updated_from is not None:
+        statement = statement.where(Post.updated_at >= updated_from)
+    if updated_to is not None:
+        statement = statement.where(Post.updated_at < updated_to)
+    result = await session.stream_scalars(
+        statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    async for post in result:
+        yield post
+
+
+async def get_or_create_tags(
+    session: AsyncSession,
+    titles: list[str],
+) -> list[Tag]:
+    """
+    Возвращает теги по названиям, создавая недостающие. Названия приводятся к нижнему
+    регистру, повторы отбрасываются.
+    """
+    titles = list(dict.fromkeys(title.strip().lower() for title in titles if title.strip()))
+    if not titles:
+        return []
+    await session.execute(
+        insert(Tag)
+        .values([{"title": title} for title in titles])
+        .on_conflict_do_nothing(index_elements=[Tag.title])
+    )
+    result = await session.execute(select(Tag).where(Tag.title.in_(titles)))
+    tags = {tag.title: tag for tag in result.scalars().all()}
+    return [tags[title] for title in titles]
 
 
 async def delete_post(
@@ -44,5 +250,6 @@ async def delete_post(
 ) -> None:
     post.publish_status = PublishStatus.archived
     session.add(post)
-    await session.commit()
-    await session.close()
+    await session.flush()
+    after_commit(session, post_cache.invalidate_post, post.post_id)
+    after_commit(session, feed_index.sync_post, post)
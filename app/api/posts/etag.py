@@ -0,0 +1,53 @@
+import hashlib
+import json
+
+from fastapi import Request, Response, status
+
+
+def _post_version(post) -> str:
+    """
+    Версия поста для ETag: время изменения и уменьшенные копии обложки. Копии создаются
+    фоновой задачей без изменения updated_at, но меняют srcset в ответе.
+    Запись обложки (Post.cover) должна быть загружена вместе с постом.
+    """
+    variants = post.cover.variants if post.cover else None
+    return f"{post.post_id}:{post.updated_at.isoformat()}:{json.dumps(variants, sort_keys=True)}"
+
+
+def post_etag(post) -> str:
+    """
+    Строгий ETag поста: меняется при каждом изменении, так как updated_at
+    обновляется базой данных, и при появлении уменьшенных копий обложки.
+    """
+    digest = hashlib.sha256(_post_version(post).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def posts_etag(posts, *parts) -> str:
+    """
+    ETag страницы постов: учитывает состав и порядок страницы, версию каждого поста
+    и дополнительные параметры ответа (например, курсор следующей страницы).
+    """
+    hasher = hashlib.sha256()
+    for post in posts:
+        hasher.update(f"{_post_version(post)};".encode())
+    for part in parts:
+        hasher.update(f"{part};".encode())
+    return f'"{hasher.hexdigest()[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Проверяет, совпадает ли один из ETag из заголовка If-None-Match с текущим.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
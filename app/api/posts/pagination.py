@@ -0,0 +1,30 @@
+import base64
+import binascii
+import uuid
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(post_id: uuid.UUID) -> str:
+    """
+    Упаковывает post_id последнего элемента страницы в непрозрачный курсор.
+    :param post_id: идентификатор последней публикации на странице
+    :return: курсор для запроса следующей страницы
+    """
+    return base64.urlsafe_b64encode(post_id.bytes).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    """
+    Распаковывает курсор, полученный от клиента, обратно в post_id.
+    :param cursor: курсор из параметра запроса
+    :return: post_id, после которого начинается следующая страница
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="invalid cursor",
+        ) from None
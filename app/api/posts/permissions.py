@@ -227,3 +227,12 @@ def authorise_delete_post_image(request, post):
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="unauthorized",
     )
+
+
+def authorize_export_posts(request) -> bool:
+    """
+    Выгружать публикации для аналитики может только администратор.
+    :param request:
+    :return:
+    """
+    return request.state.user_role == UserRole.admin
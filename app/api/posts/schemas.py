@@ -1,15 +1,20 @@
 import uuid
-from typing import Annotated
+from typing import Annotated, Literal
 
 from fastapi import UploadFile, File
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 from datetime import datetime
 
 from app.models import PublishStatus
 
 
+TagTitle = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=50)]
+
+
 class Tag(BaseModel):
-    tag_id: int
+    model_config = ConfigDict(from_attributes=True)
+
+    tag_id: uuid.UUID
     title: str
 
 
@@ -20,6 +25,7 @@ class PostBase(BaseModel):
 
 class PostCreate(PostBase):
     post_image: Annotated[UploadFile, File()] | str = None
+    pinned_tags: list[TagTitle] = Field(default=[], max_length=10)
 
 
 class PostUpdate(PostBase): ...
@@ -29,6 +35,7 @@ class PostUpdatePartial(BaseModel):
     title: str | None = None
     content: str | None = None
     post_image: Annotated[UploadFile, File()] | str = None
+    pinned_tags: list[TagTitle] | None = Field(default=None, max_length=10)
     publish_status: PublishStatus | None = None
 
 
@@ -39,5 +46,60 @@ class PostResponse(PostBase):
     author_id: uuid.UUID
     publish_status: str | None
     post_image: str | None
+    post_image_srcset: str | None = None
+    excerpt: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    pinned_tags: list[Tag] = []
+
+
+class PostSummaryResponse(BaseModel):
+    """
+    Сокращенное представление поста для лент: без содержания, с анонсом.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    post_id: uuid.UUID
+    title: str
+    excerpt: str | None
+    author_id: uuid.UUID
+    publish_status: str | None
+    post_image: str | None
+    post_image_srcset: str | None = None
     created_at: datetime
     updated_at: datetime
+    pinned_tags: list[Tag] = []
+
+
+class PostsPage(BaseModel):
+    items: list[PostResponse]
+    next_cursor: str | None = None
+
+
+class PostSummaryPage(BaseModel):
+    items: list[PostSummaryResponse]
+    next_cursor: str | None = None
+
+
+class PostSearchPage(BaseModel):
+    items: list[PostResponse]
+    next_offset: int | None = None
+
+
+class PostSummarySearchPage(BaseModel):
+    items: list[PostSummaryResponse]
+    next_offset: int | None = None
+
+
+class PostsBatchRequest(BaseModel):
+    post_ids: list[uuid.UUID] = Field(..., min_length=1, max_length=300)
+
+
+class PostsBatchItem(BaseModel):
+    post_id: uuid.UUID
+    status: Literal["ok", "not_found", "forbidden"]
+    post: PostResponse | None = None
+
+
+class PostsBatchResponse(BaseModel):
+    items: list[PostsBatchItem]
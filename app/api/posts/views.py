@@ -1,19 +1,43 @@
-from typing import List
+from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status, Request, HTTPException, Form
+from fastapi import APIRouter, Depends, status, Request, HTTPException, Form, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Post, PublishStatus, db_helper
 from app.conf.s3_client import S3AsyncClient, s3client
-from app.services import post_service, S3ImageManager
+from app.services import post_service, post_cache, feed_index, S3ImageManager
 from . import crud
 from . import permissions as perm
-from .schemas import PostResponse, PostUpdatePartial, PostCreate
+from .schemas import (
+    PostResponse,
+    PostUpdatePartial,
+    PostCreate,
+    PostsPage,
+    PostSummaryPage,
+    PostSearchPage,
+    PostSummarySearchPage,
+    PostsBatchRequest,
+    PostsBatchItem,
+    PostsBatchResponse,
+)
 from .dependencies import post_by_id
+from .pagination import encode_cursor, decode_cursor
+from .etag import post_etag, posts_etag, is_not_modified, not_modified
 from app.services.image_service import image_delete
-from app.tasks.task import send_message_task
+
+async def _set_image_urls(post: Post, storage: S3ImageManager) -> None:
+    """
+    Заменяет ключ обложки ссылкой на нее и добавляет srcset из уменьшенных копий.
+    Запись обложки (Post.cover) должна быть загружена вместе с постом.
+    """
+    if post.post_image:
+        post.post_image_srcset = await storage.generate_srcset(post.cover.variants if post.cover else None)
+        post.post_image = await storage.generate_url(post.post_image)
+
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
 required_auth = HTTPBearer(auto_error=False)
@@ -27,19 +51,29 @@ required_auth = HTTPBearer(auto_error=False)
 async def get_post(
     post_id: UUID,
     request: Request,
-    post: Post = Depends(post_by_id),
+    response: Response,
+    session: AsyncSession = Depends(db_helper.read_session_dependency),
     creds = Depends(required_auth),
     client: S3AsyncClient = Depends(s3client.get_client),
 ):
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Post by id {post_id} not found",
-        )
+    """
+    Опубликованные посты отдаются из кэша без обращения к базе данных.
+    Если ETag из If-None-Match совпадает с текущим, возвращается 304 без тела.
+    """
+    if cached := await post_cache.get_cached_post(post_id):
+        etag, body = cached
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    post = await crud.get_post(post_id=post_id, session=session, request=request)
     if perm.authorize_get_post(request=request, post=post):
-        if post.post_image:
-            storage = S3ImageManager("post-illustration-images", client)
-            post.post_image = await storage.generate_url(post.post_image)
+        etag = post_etag(post)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        storage = S3ImageManager("post-illustration-images", client)
+        await _set_image_urls(post, storage)
+        await post_cache.cache_post(post)
+        response.headers["ETag"] = etag
         return post
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -49,38 +83,182 @@ async def get_post(
 
 @router.get(
     "/get_posts",
-    response_model=List[PostResponse],
+    response_model=PostsPage | PostSummaryPage,
     status_code=status.HTTP_200_OK,
 )
 async def get_posts(
     request: Request,
+    response: Response,
     publish_status: PublishStatus = PublishStatus.published,
-    session: AsyncSession = Depends(db_helper.scoped_session_dependency),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    tag: str | None = Query(None, max_length=50),
+    fields: Literal["full", "summary"] = "full",
+    session: AsyncSession = Depends(db_helper.read_session_dependency),
     creds = Depends(required_auth),
     client: S3AsyncClient = Depends(s3client.get_client),
 ):
     """
-    Метод возвращает публикации, с фильтрацией по статусу. В зависимости от параметров проходит проверка прав доступа
-    :return: list[Post]
+    Метод возвращает страницу публикаций, с фильтрацией по статусу и тегу, от новых к старым.
+    Для получения следующей страницы нужно передать next_cursor из предыдущего ответа.
+    С fields=summary возвращаются посты без содержания, с анонсом.
+    Если ETag из If-None-Match совпадает с текущим, возвращается 304 без тела.
+    В зависимости от параметров проходит проверка прав доступа
+    :return: PostsPage | PostSummaryPage
     """
     if perm.authorize_get_posts(publish_status, request=request):
-        result = await crud.get_filtered_posts(session, publish_status, request)
-        if not result:
+        after = decode_cursor(cursor) if cursor else None
+        summary = fields == "summary"
+        page = None
+        if publish_status == PublishStatus.published and tag is None:
+            page = await feed_index.get_feed_page(limit, after)
+        if page is not None:
+            post_ids, has_more = page
+            result = await crud.get_published_posts_by_ids(session, post_ids, summary)
+        else:
+            result, has_more = await crud.get_filtered_posts(
+                session, publish_status, request,
+                limit=limit, after=after, tag=tag, summary=summary,
+            )
+            post_ids = [post.post_id for post in result]
+        if not result and after is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No publications such {publish_status} were found",
             )
+        next_cursor = encode_cursor(post_ids[-1]) if has_more else None
+        etag = posts_etag(result, fields, next_cursor)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
         storage = S3ImageManager("post-illustration-images", client)
         for post in result:
-            if post.post_image:
-                post.post_image = await storage.generate_url(post.post_image)
-        return result
+            await _set_image_urls(post, storage)
+        response.headers["ETag"] = etag
+        page_model = PostSummaryPage if summary else PostsPage
+        return page_model(items=result, next_cursor=next_cursor)
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="unauthorized",
     )
 
 
+@router.post(
+    "/batch_get",
+    response_model=PostsBatchResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def batch_get_posts(
+    request: Request,
+    batch_in: PostsBatchRequest,
+    session: AsyncSession = Depends(db_helper.read_session_dependency),
+    _creds = Depends(required_auth),
+    client: S3AsyncClient = Depends(s3client.get_client),
+):
+    """
+    Метод возвращает несколько постов одним запросом к базе данных, в порядке запроса.
+    Для каждого идентификатора проходит та же проверка прав доступа, что и в get_post;
+    ненайденные и недоступные посты отмечаются статусом вместо ошибки всего запроса.
+    :return: PostsBatchResponse
+    """
+    post_ids = list(dict.fromkeys(batch_in.post_ids))
+    posts = await crud.get_posts_by_ids(session, post_ids)
+    # ссылки подписываются только для постов, которые пользователь может получить
+    allowed = {
+        post_id: post
+        for post_id, post in posts.items()
+        if perm.authorize_get_post(request=request, post=post)
+    }
+    storage = S3ImageManager("post-illustration-images", client)
+    for post in allowed.values():
+        await _set_image_urls(post, storage)
+    items = []
+    for post_id in batch_in.post_ids:
+        if post_id in allowed:
+            items.append(PostsBatchItem(post_id=post_id, status="ok", post=allowed[post_id]))
+        elif post_id in posts:
+            items.append(PostsBatchItem(post_id=post_id, status="forbidden"))
+        else:
+            items.append(PostsBatchItem(post_id=post_id, status="not_found"))
+    return PostsBatchResponse(items=items)
+
+
+@router.get(
+    "/search",
+    response_model=PostSearchPage | PostSummarySearchPage,
+    status_code=status.HTTP_200_OK,
+)
+async def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    fields: Literal["full", "summary"] = "full",
+    session: AsyncSession = Depends(db_helper.read_session_dependency),
+    _creds = Depends(required_auth),
+    client: S3AsyncClient = Depends(s3client.get_client),
+):
+    """
+    Метод ищет публикации по заголовку и содержанию, результаты упорядочены по релевантности.
+    Неавторизованным пользователям доступны только опубликованные посты.
+    С fields=summary возвращаются посты без содержания, с анонсом.
+    :return: PostSearchPage | PostSummarySearchPage
+    """
+    summary = fields == "summary"
+    result, has_more = await crud.search_posts(
+        session, q, request, limit=limit, offset=offset, summary=summary,
+    )
+    storage = S3ImageManager("post-illustration-images", client)
+    for post in result:
+        await _set_image_urls(post, storage)
+    next_offset = offset + limit if has_more else None
+    page_model = PostSummarySearchPage if summary else PostSearchPage
+    return page_model(items=result, next_offset=next_offset)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def export_posts(
+    request: Request,
+    publish_status: PublishStatus | None = None,
+    author_id: UUID | None = None,
+    updated_from: datetime | None = None,
+    updated_to: datetime | None = None,
+    _creds: HTTPAuthorizationCredentials = Depends(required_auth),
+    client: S3AsyncClient = Depends(s3client.get_client),
+):
+    """
+    Метод выгружает публикации в формате NDJSON (один пост в строке) для аналитики.
+    Посты читаются из базы пачками и сразу отправляются клиенту, весь результат
+    в памяти не собирается. Доступно только администратору.
+    """
+    if not perm.authorize_export_posts(request=request):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="unauthorized",
+        )
+    storage = S3ImageManager("post-illustration-images", client)
+
+    async def ndjson_lines():
+        # сессия открывается внутри генератора: зависимости завершаются раньше,
+        # чем отправляется тело потокового ответа
+        async with db_helper.read_session() as session:
+            posts = crud.stream_posts(
+                session,
+                publish_status=publish_status,
+                author_id=author_id,
+                updated_from=updated_from,
+                updated_to=updated_to,
+            )
+            async for post in posts:
+                await _set_image_urls(post, storage)
+                yield PostResponse.model_validate(post).model_dump_json() + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 @router.post(
     "/create_post",
     response_model=None,  # PostResponse,
@@ -128,6 +306,9 @@ async def update_post(
             storage = S3ImageManager("post-illustration-images", client)
             post.post_image = await storage.generate_url(updated_post.post_image)
         if updated_post.publish_status == "published":
+            # Celery импортируется только там, где ставятся задачи
+            from app.tasks.task import send_message_task
+
             send_message_task.delay(updated_post.content)
         return updated_post
     raise HTTPException(
@@ -6,7 +6,7 @@ from fastapi import HTTPException, status, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.auth.utils_jwt import decode_jwt
-from app.api.users.crud import get_user
+from app.services.user_cache import get_user
 from app.models import db_helper
 
 required_auth = HTTPBearer(auto_error=True)
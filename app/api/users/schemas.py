@@ -27,6 +27,7 @@ class UserSchema(BaseModel):
     login: str
     email: EmailStr
     profile_image: str | None
+    profile_image_srcset: str | None = None
     role: UserRole
 
 
@@ -2,12 +2,13 @@ from fastapi import APIRouter, status, Depends, Form, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.images.schemas import UploadUrlRequest, UploadUrlResponse, UploadConfirm
 from app.api.users.dependencies import get_user_by_access
 from app.api.users.schemas import UserUpdatePartial, UserUpdatePassword, UserSchema
 from app.conf.s3_client import S3AsyncClient, s3client
 from app.models import User, db_helper
-from app.services import S3ImageManager, user_update, user_password_update
-from app.services.image_service import image_delete
+from app.services import S3ImageManager, user_update, user_avatar_confirm, user_password_update
+from app.services.image_service import image_delete, create_upload_url
 
 router = APIRouter(prefix="/users", tags=["Users"])
 required_auth = HTTPBearer(auto_error=True)
@@ -30,10 +31,53 @@ async def update_user(
         updated_user.profile_image = updated_user.image.image_url
     elif user.profile_image:
         storage = S3ImageManager("users-avatar-images", client)
+        updated_user.profile_image_srcset = await storage.generate_srcset(getattr(user, "profile_image_variants", None))
         updated_user.profile_image = await storage.generate_url(user.profile_image)
     return updated_user
 
 
+@router.post(
+    "/avatar_upload_url",
+    response_model=UploadUrlResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def avatar_upload_url(
+    upload_in: UploadUrlRequest,
+    _creds: HTTPAuthorizationCredentials = Depends(required_auth),
+    user: User = Depends(get_user_by_access),
+    client: S3AsyncClient = Depends(s3client.get_client),
+):
+    """
+    Выдает политику для загрузки аватара прямо в хранилище.
+    После загрузки ее нужно подтвердить в /users/confirm_avatar_upload.
+    """
+    storage = S3ImageManager("users-avatar-images", client)
+    return await create_upload_url(
+        upload_in.file_name,
+        upload_in.content_type,
+        user.user_id,
+        storage,
+        user,
+    )
+
+
+@router.post(
+    "/confirm_avatar_upload",
+    response_model=UserSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def confirm_avatar_upload(
+    confirm_in: UploadConfirm,
+    _creds: HTTPAuthorizationCredentials = Depends(required_auth),
+    user: User = Depends(get_user_by_access),
+    session: AsyncSession = Depends(db_helper.scoped_session_dependency),
+    client: S3AsyncClient = Depends(s3client.get_client),
+):
+    updated_user = await user_avatar_confirm(confirm_in.upload_token, user, session, client)
+    updated_user.profile_image = updated_user.image.image_url
+    return updated_user
+
+
 @router.patch(
     path="/update_user_password",
     response_model=UserSchema,
@@ -49,6 +93,7 @@ async def update_user_password(
     await user_password_update(user_password_in, user, session)
     if user.profile_image:
         storage = S3ImageManager("users-avatar-images", client)
+        user.profile_image_srcset = await storage.generate_srcset(getattr(user, "profile_image_variants", None))
         user.profile_image = await storage.generate_url(user.profile_image)
     return user
 
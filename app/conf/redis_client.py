@@ -0,0 +1,28 @@
+from functools import cache
+
+from redis.asyncio import Redis
+
+from app.settings import settings
+
+
+def create_redis_client() -> Redis:
+    """
+    Создает асинхронный клиент Redis для кэшей приложения.
+    Соединения открываются лениво, при первой команде, и привязаны к текущему event loop,
+    поэтому в Celery-задачах (asyncio.run на каждый запуск) нужен собственный клиент.
+    """
+    return Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        password=settings.redis_pass,
+        db=settings.redis_cache_db,
+        socket_timeout=settings.redis_socket_timeout,
+    )
+
+
+@cache
+def get_redis_client() -> Redis:
+    """
+    Общий клиент Redis приложения, создается при первом обращении.
+    """
+    return create_redis_client()
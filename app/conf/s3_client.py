@@ -1,44 +1,82 @@
-import os
-
-import aioboto3
-
-from dotenv import load_dotenv
-
-load_dotenv()
+from app.settings import settings
 
 
 class S3AsyncClient:
+    """
+    Один клиент S3 на воркер: открывается в lifespan приложения и переиспользует
+    пул keep-alive соединений botocore во всех запросах. Для кода вне приложения
+    (задачи Celery со своим event loop) - короткоживущий клиент через `async with`.
+    """
     _cached_session = None
 
     def __init__(self):
-        self.endpoint_domain = f"{os.getenv("MINIO_HOST")}:{os.getenv("MINIO_PORT")}"
-        self.use_ssl = os.getenv("MINIO_USE_SSL").lower() == "true"
-        if S3AsyncClient._cached_session is None:
-            S3AsyncClient._cached_session = aioboto3.Session(
-                aws_access_key_id=os.getenv("MINIO_ACCESS_KEY"),
-                aws_secret_access_key=os.getenv("MINIO_SECRET_KEY"),
-            )
+        self.endpoint_domain = f"{settings.minio_host}:{settings.minio_port}"
+        self.use_ssl = settings.minio_use_ssl
         self.endpoint_url = self._get_endpoint_url()
+        self.s3_client = None
+        self._client_cm = None
 
     async def __aenter__(self):
-        self.s3_client = await self.client.__aenter__()
+        self._client_cm = self.client
+        self.s3_client = await self._client_cm.__aenter__()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.s3_client.__aexit__(exc_type, exc_val, exc_tb)
+        client_cm, self._client_cm, self.s3_client = self._client_cm, None, None
+        await client_cm.__aexit__(exc_type, exc_val, exc_tb)
+
+    @staticmethod
+    def _session():
+        # aioboto3 (botocore) импортируется долго, поэтому только при первом обращении к S3
+        if S3AsyncClient._cached_session is None:
+            import aioboto3
+
+            S3AsyncClient._cached_session = aioboto3.Session(
+                aws_access_key_id=settings.minio_access_key,
+                aws_secret_access_key=settings.minio_secret_key,
+            )
+        return S3AsyncClient._cached_session
+
+    @staticmethod
+    def _config():
+        from botocore.config import Config
+
+        return Config(
+            max_pool_connections=settings.s3_max_pool_connections,
+            connect_timeout=settings.s3_connect_timeout,
+            read_timeout=settings.s3_read_timeout,
+            tcp_keepalive=True,
+            retries={"max_attempts": settings.s3_max_attempts, "mode": "standard"},
+        )
 
     @property
     def client(self):
-        return S3AsyncClient._cached_session.client(
-            "s3", endpoint_url=self.endpoint_url, use_ssl=self.use_ssl
+        return self._session().client(
+            "s3", endpoint_url=self.endpoint_url, use_ssl=self.use_ssl, config=self._config()
         )
 
+    async def start(self) -> None:
+        """
+        Открывает общий клиент. Вызывается один раз при старте приложения.
+        """
+        if self.s3_client is None:
+            await self.__aenter__()
+
+    async def close(self) -> None:
+        """
+        Закрывает общий клиент и его пул соединений при остановке приложения.
+        """
+        if self.s3_client is not None:
+            await self.__aexit__(None, None, None)
+
     async def get_client(self):
-        try:
-            async with self as client:
-                return client.s3_client
-        except Exception as e:
-            raise e
+        """
+        Зависимость FastAPI: возвращает общий клиент, открытый в lifespan.
+        """
+        if self.s3_client is None:
+            msg = "S3 client is not started"
+            raise RuntimeError(msg)
+        return self.s3_client
 
     def _get_endpoint_url(self) -> str:
         if self.endpoint_domain.startswith("http"):
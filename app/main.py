@@ -3,20 +3,31 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from app.services import administrator_create, s3storage_manager
+from app.services.feed_index import ensure_feed_index
+from app.api.auth.password_hasher import password_hasher
 from app.api.auth.views import router as auth_router
 from app.api.users.views import router as users_router
 from app.api.posts.views import router as posts_router
 from app.api.images.views import router as images_router
+from app.api.metrics.views import router as metrics_router
+from app.conf.s3_client import s3client
 from app.middleware import AuthMiddleware
+from app.models import db_helper
 
 
 @asynccontextmanager
 async def lifespan(
     application: FastAPI,
 ):
+    await s3client.start()
     await administrator_create()
     await s3storage_manager.initialize_buckets()
+    await ensure_feed_index()
+    db_helper.start_health_checks()
     yield
+    await db_helper.stop_health_checks()
+    password_hasher.shutdown()
+    await s3client.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -27,6 +38,7 @@ app.include_router(auth_router, prefix="/api/v1")
 app.include_router(users_router, prefix="/api/v1")
 app.include_router(posts_router, prefix="/api/v1")
 app.include_router(images_router, prefix="/api/v1")
+app.include_router(metrics_router, prefix="/api/v1")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,41 +1,76 @@
 import uuid
 
 import jwt
-from fastapi import Request, status
-from fastapi.security import HTTPBearer
+from fastapi import status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
 from app.api.auth.utils_jwt import decode_jwt
+from app.api.auth.token_cache import VerifiedTokenCache, token_cache as default_token_cache
+
+
+class AuthMiddleware:
+    """
+    ASGI middleware аутентификации: разбирает Bearer-токен из заголовка Authorization
+    и кладет user_id и user_role в состояние запроса (request.state).
+    Без токена запрос проходит анонимно, с невалидным токеном - отклоняется с 401.
+    В отличие от BaseHTTPMiddleware не создает на каждый запрос дополнительные задачи
+    и потоки памяти и не вмешивается в потоковые ответы и фоновые задачи.
+    """
 
+    def __init__(self, app: ASGIApp, token_cache: VerifiedTokenCache = default_token_cache):
+        self.app = app
+        self._token_cache = token_cache
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self._required_auth = HTTPBearer(auto_error=False)
+    @staticmethod
+    def _bearer_token(scope: Scope) -> str | None:
+        authorization = Headers(scope=scope).get("authorization")
+        scheme, credentials = get_authorization_scheme_param(authorization)
+        if not (authorization and scheme and credentials):
+            return None
+        if scheme.lower() != "bearer":
+            return None
+        return credentials
 
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path.startswith("/api/v1/auth"):
-            return await call_next(request)
-        token = await self._required_auth(request)
+    def _verify(self, token: str) -> tuple[uuid.UUID, str | None]:
+        if claims := self._token_cache.get(token):
+            return claims
+        payload = decode_jwt(token)
+        user_id = uuid.UUID(payload.get("sub"))
+        user_role = payload.get("role")
+        if expires_at := payload.get("exp"):
+            self._token_cache.put(token, user_id, user_role, expires_at)
+        return user_id, user_role
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith("/api/v1/auth"):
+            await self.app(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+        token = self._bearer_token(scope)
         if token:
             try:
-                payload = decode_jwt(token.credentials)
-                user_id = payload.get("sub")
-                request.state.user_id = uuid.UUID(user_id)
-                user_role = payload.get("role")
-                request.state.user_role = user_role
-            except (HTTPException, jwt.InvalidTokenError, jwt.ExpiredSignatureError):
-                return JSONResponse(
+                state["user_id"], state["user_role"] = self._verify(token)
+            except (
+                HTTPException,
+                jwt.InvalidTokenError,
+                jwt.ExpiredSignatureError,
+                TypeError,
+                ValueError,
+            ):
+                response = JSONResponse(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     content={
                         "detail": "Not authenticated",
                         "headers": {"WWW-Authenticate": "Bearer"},
                     },
                 )
+                await response(scope, receive, send)
+                return
         else:
-            request.state.user_id = None
-            request.state.user_role = None
-
-        response = await call_next(request)
-        return response
+            state["user_id"] = None
+            state["user_role"] = None
+        await self.app(scope, receive, send)
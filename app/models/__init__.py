@@ -9,12 +9,14 @@ __all__ = (
     "PostTag",
     "PublishStatus",
     "db_helper",
+    "after_commit",
+    "on_rollback",
     "url_object",
     "AvatarImage",
 )
 
 from .db import Base
-from .db_helper import db_helper, url_object
+from .db_helper import db_helper, url_object, after_commit, on_rollback
 from .user import User, UserRole, AvatarImage
 from .jwt_session import JWTSession
 from .post import Post, Tag, PostImage, PostTag, PublishStatus
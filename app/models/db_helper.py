@@ -1,26 +1,215 @@
-import os
+import asyncio
+import itertools
+import logging
+import time
 from asyncio import current_task
 
-from dotenv import load_dotenv
+from fastapi import Request
+from redis.exceptions import RedisError
+from sqlalchemy import event, exc, make_url, text
 from sqlalchemy.engine.url import URL
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     create_async_engine,
     async_sessionmaker,
     async_scoped_session,
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-load_dotenv()
+from app.conf.redis_client import get_redis_client
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+AFTER_COMMIT = "after_commit"
+ON_ROLLBACK = "on_rollback"
+# отметка о том, что в транзакции были изменения (для read-your-writes)
+HAS_WRITES = "has_writes"
+
+
+def after_commit(session, callback, *args) -> None:
+    """
+    Откладывает действие до фиксации транзакции запроса: удаление объектов из S3,
+    инвалидацию кэшей. При откате транзакции действие не выполняется.
+    :param callback: корутинная функция, вызывается как await callback(*args)
+    """
+    session.info.setdefault(AFTER_COMMIT, []).append((callback, args))
+
+
+def on_rollback(session, callback, *args) -> None:
+    """
+    Регистрирует компенсирующее действие для побочного эффекта вне базы данных
+    (например, удаление загруженного в S3 объекта), выполняется при откате транзакции запроса.
+    :param callback: корутинная функция, вызывается как await callback(*args)
+    """
+    session.info.setdefault(ON_ROLLBACK, []).append((callback, args))
+
+
+async def _run_callbacks(callbacks: list) -> None:
+    for callback, args in callbacks:
+        try:
+            await callback(*args)
+        except Exception:
+            logger.exception("unit of work callback %s failed", callback)
+
+
+class PoolStats:
+    """
+    Накопительная статистика получения соединений из пула: время ожидания,
+    гистограмма задержек и число таймаутов.
+    """
+
+    # верхние границы интервалов гистограммы, в миллисекундах
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+        self.wait_time_total += seconds
+        self.wait_time_max = max(self.wait_time_max, seconds)
+        milliseconds = seconds * 1000
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if milliseconds <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def as_dict(self) -> dict:
+        observed = self.checkouts + self.timeouts
+        labels = [f"le_{bound}ms" for bound in self.BUCKETS_MS] + ["inf"]
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_time_total / observed * 1000, 3) if observed else 0.0,
+            "max_wait_ms": round(self.wait_time_max * 1000, 3),
+            "checkout_latency_histogram": dict(zip(labels, self.histogram, strict=True)),
+        }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который замеряет время получения соединения, включая ожидание
+    свободного соединения, открытие нового и pre-ping.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.observe(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class WriteTrackingSession(Session):
+    """
+    Сессия, которая отмечает в info, что в транзакции были сброшены изменения.
+    """
+
+
+@event.listens_for(WriteTrackingSession, "after_flush")
+def _mark_writes(session, _flush_context):
+    session.info[HAS_WRITES] = True
+
+
+class Replica:
+    """
+    Реплика для чтения со своим пулом соединений и признаком доступности.
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session_factory = async_sessionmaker(
+            bind=engine,
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+        )
+        self.healthy = True
+
+    @property
+    def name(self) -> str:
+        url = self.engine.url
+        return f"{url.host}:{url.port}/{url.database}"
 
 
 class DatabaseHelper:
-    def __init__(self, url: URL, echo: bool = False):
-        self.engine = create_async_engine(url=url, echo=echo)
+    def __init__(
+        self,
+        url: URL,
+        echo: bool = False,
+        replica_urls: list[URL | str] = (),
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        statement_cache_size: int = 100,
+        replica_health_interval: float = 5,
+        read_your_writes_seconds: int = 0,
+    ):
+        """
+        :param replica_urls: адреса реплик для чтения; без них чтение идет с основного сервера
+        :param pool_size: число постоянных соединений пула в каждом воркере
+        :param max_overflow: сколько соединений можно открыть сверх pool_size под нагрузкой
+        :param pool_timeout: сколько секунд ждать свободного соединения до ошибки
+        :param pool_recycle: через сколько секунд пересоздавать соединение (-1 - не пересоздавать)
+        :param pool_pre_ping: проверять соединение перед выдачей из пула
+        :param statement_cache_size: размер кэша подготовленных выражений asyncpg
+        (0 - для работы через pgbouncer в режиме transaction)
+        :param replica_health_interval: как часто проверять доступность реплик, в секундах
+        :param read_your_writes_seconds: сколько секунд после своего изменения пользователь
+        читает с основного сервера, чтобы не увидеть устаревшие данные реплики (0 - не читает)
+        """
+        self.max_overflow = max_overflow
+        engine_options = {
+            "echo": echo,
+            "poolclass": InstrumentedAsyncQueuePool,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+            "pool_pre_ping": pool_pre_ping,
+            "connect_args": {"statement_cache_size": statement_cache_size},
+        }
+        self.engine = create_async_engine(url=url, **engine_options)
         self.session_factory = async_sessionmaker(
             bind=self.engine,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False,
+            sync_session_class=WriteTrackingSession,
         )
+        self.replicas = [
+            Replica(create_async_engine(url=make_url(replica_url), **engine_options))
+            for replica_url in replica_urls
+        ]
+        self._replica_cycle = itertools.cycle(self.replicas)
+        self.replica_health_interval = replica_health_interval
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._health_task: asyncio.Task | None = None
 
     def _get_scoped_session(self):
         session = async_scoped_session(
@@ -29,19 +218,171 @@ class DatabaseHelper:
         )
         return session
 
-    async def scoped_session_dependency(self):
+    async def scoped_session_dependency(self, request: Request):
+        """
+        Сессия запроса работает как unit of work: сервисы только сбрасывают изменения
+        через flush, а транзакция фиксируется один раз, после выполнения обработчика.
+        Изменения объектов, не сброшенные через flush (например, ссылки на изображения,
+        подставленные в объекты для ответа), не сохраняются.
+        При любой ошибке транзакция откатывается целиком и выполняются компенсирующие
+        действия on_rollback, после успешной фиксации - отложенные действия after_commit.
+        Если в транзакции были изменения, пользователь на время читает с основного сервера.
+        """
         session = self._get_scoped_session()
-        yield session
-        await session.close()
+        try:
+            yield session
+            session.expunge_all()
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            await _run_callbacks(session.info.pop(ON_ROLLBACK, [])[::-1])
+            raise
+        else:
+            if session.info.get(HAS_WRITES):
+                await self._stick_to_primary(request)
+            await _run_callbacks(session.info.pop(AFTER_COMMIT, []))
+        finally:
+            session.info.clear()
+            await session.close()
+
+    @staticmethod
+    def _sticky_key(user_id) -> str:
+        return f"read_primary:{user_id}"
+
+    async def _stick_to_primary(self, request: Request) -> None:
+        user_id = getattr(request.state, "user_id", None)
+        if not (self.replicas and self.read_your_writes_seconds and user_id):
+            return
+        try:
+            await get_redis_client().set(self._sticky_key(user_id), 1, ex=self.read_your_writes_seconds)
+        except RedisError as e:
+            logger.warning("read-your-writes mark failed: %s", e)
+
+    async def _is_sticky(self, request: Request) -> bool:
+        user_id = getattr(request.state, "user_id", None)
+        if not (self.read_your_writes_seconds and user_id):
+            return False
+        try:
+            return bool(await get_redis_client().exists(self._sticky_key(user_id)))
+        except RedisError as e:
+            # без Redis нельзя проверить, были ли изменения, поэтому читаем с основного сервера
+            logger.warning("read-your-writes check failed: %s", e)
+            return True
+
+    def _pick_replica(self) -> Replica | None:
+        for _ in range(len(self.replicas)):
+            replica = next(self._replica_cycle)
+            if replica.healthy:
+                return replica
+        return None
+
+    def read_session(self):
+        """
+        Сессия только для чтения на доступной реплике (по очереди) или, если доступных
+        реплик нет, на основном сервере. Данные реплики могут немного отставать.
+        """
+        if replica := self._pick_replica():
+            session = replica.session_factory()
+            session.info["replica"] = replica
+            return session
+        return self.session_factory()
+
+    async def read_session_dependency(self, request: Request):
+        """
+        Сессия для публичных эндпоинтов чтения. Изменения в ней не фиксируются.
+        Пользователь, недавно изменивший данные, читает с основного сервера (read-your-writes).
+        """
+        if self.replicas and not await self._is_sticky(request):
+            session = self.read_session()
+        else:
+            session = self.session_factory()
+        try:
+            yield session
+        except (exc.OperationalError, exc.InterfaceError, OSError):
+            if replica := session.info.get("replica"):
+                # реплика исключается из чтения до следующей успешной проверки
+                replica.healthy = False
+                logger.warning("replica %s is marked unavailable", replica.name)
+            raise
+        finally:
+            await session.close()
+
+    async def _check_replica(self, replica: Replica) -> None:
+        try:
+            async with asyncio.timeout(self.replica_health_interval):
+                async with replica.engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        except (exc.SQLAlchemyError, OSError, TimeoutError) as e:
+            if replica.healthy:
+                logger.warning("replica %s is unavailable: %s", replica.name, e)
+            replica.healthy = False
+        else:
+            if not replica.healthy:
+                logger.info("replica %s is available again", replica.name)
+            replica.healthy = True
+
+    async def _health_check_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+            await asyncio.sleep(self.replica_health_interval)
+
+    def start_health_checks(self) -> None:
+        """
+        Запускает периодическую проверку реплик. Вызывается при старте приложения.
+        """
+        if self.replicas and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_check_loop())
+
+    async def stop_health_checks(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    def replica_stats(self) -> list[dict]:
+        return [
+            {
+                "replica": replica.name,
+                "healthy": replica.healthy,
+                "checked_out": replica.engine.sync_engine.pool.checkedout(),
+                **replica.engine.sync_engine.pool.stats.as_dict(),
+            }
+            for replica in self.replicas
+        ]
+
+    def pool_stats(self) -> dict:
+        """
+        Текущее состояние пула соединений и статистика ожидания соединений.
+        """
+        pool = self.engine.sync_engine.pool
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": self.max_overflow,
+            **pool.stats.as_dict(),
+        }
 
 
 url_object = URL.create(
     "postgresql+asyncpg",
-    username=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASS"),
-    host=os.getenv("DB_HOST"),
-    database=os.getenv("DB_NAME"),
-    port=os.getenv("DB_PORT"),
+    username=settings.db_user,
+    password=settings.db_pass,
+    host=settings.db_host,
+    database=settings.db_name,
+    port=settings.db_port,
 )
 
-db_helper = DatabaseHelper(url_object, echo=False)
+db_helper = DatabaseHelper(
+    url_object,
+    echo=False,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    statement_cache_size=settings.db_statement_cache_size,
+    replica_urls=settings.db_replica_urls,
+    replica_health_interval=settings.db_replica_health_interval,
+    read_your_writes_seconds=settings.db_read_your_writes_seconds,
+)
@@ -12,7 +12,7 @@ class JWTSession(Base):
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, server_default=text("uuidv7()")
     )
-    token_id: Mapped[uuid.UUID] = mapped_column(UUID, nullable=False)
+    token_id: Mapped[uuid.UUID] = mapped_column(UUID, nullable=False, unique=True, index=True)
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID,
         ForeignKey("users.user_id", ondelete="CASCADE"),
@@ -20,5 +20,5 @@ class JWTSession(Base):
         unique=True,
     )
     token: Mapped[str] = mapped_column(String, nullable=False)
-    expires_in: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_in: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
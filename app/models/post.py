@@ -3,13 +3,17 @@ from enum import StrEnum
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey, Enum, Text, text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Computed, and_, ForeignKey, Enum, Index, Text, text
+from sqlalchemy.orm import Mapped, foreign, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
 
 from . import Base
 
 
+# конфигурация полнотекстового поиска; для латиницы она использует английский стеммер
+SEARCH_CONFIG = "russian"
+
+
 class PublishStatus(StrEnum):
     draft = "draft"
     # не опубликовано как новое, при создании (возможна промежуточная версия в бд)
@@ -28,29 +32,40 @@ class Tag(Base):
     tag_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, server_default=text("uuidv7()")
     )
-    title: Mapped[str]
+    title: Mapped[str] = mapped_column(unique=True)
     marked_posts: Mapped[list["Post"]] = relationship(
         back_populates="pinned_tags",
         secondary="posts_tags",
+        lazy="raise",
     )
 
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # пагинация ленты по ключу: фильтр по статусу + диапазон post_id (uuidv7)
+        Index("ix_posts_publish_status_post_id", "publish_status", "post_id"),
+        Index("ix_posts_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     post_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, server_default=text("uuidv7()")
     )
     title: Mapped[str]
     content: Mapped[str] = mapped_column(Text, default="", server_default="")
+    # анонс для списков публикаций, вычисляется при создании и изменении содержания
+    excerpt: Mapped[str | None]
     post_image: Mapped[Optional[str]]
     # series_posts_name: Mapped[Optional[str]] на данный момент реализация вне планов
     author_id: Mapped[int] = mapped_column(ForeignKey("users.user_id"))
     # необходимо определить параметр 'on_delete',
     # возможно стоит сохранять имя автора без ссылки на него, а не Set Null
+    # теги загружаются только явно, через selectinload: ленивая загрузка в async-коде
+    # означала бы отдельный запрос на каждый пост
     pinned_tags: Mapped[Optional[list["Tag"]]] = relationship(
         back_populates="marked_posts",
         secondary="posts_tags",
+        lazy="raise",
     )
     publish_status: Mapped[PublishStatus] = mapped_column(
         Enum(PublishStatus), default=PublishStatus.draft
@@ -63,10 +78,33 @@ class Post(Base):
         onupdate=text("TIMEZONE('utc', now())"),
     )
     images: Mapped[list["PostImage"]] = relationship(back_populates="post")
+    # запись изображения обложки, нужна для варианта размеров (srcset); загружается только явно
+    cover: Mapped["PostImage | None"] = relationship(
+        primaryjoin=lambda: and_(
+            foreign(Post.post_image) == PostImage.image_key,
+            foreign(Post.post_id) == PostImage.post_id,
+        ),
+        viewonly=True,
+        lazy="raise",
+    )
+    # вычисляется базой данных, в выборки постов не загружается
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
 
 class PostTag(Base):
     __tablename__ = "posts_tags"
+    __table_args__ = (
+        # фильтр постов по тегу: первичный ключ начинается с post_id и здесь не помогает
+        Index("ix_posts_tags_tag_id_post_id", "tag_id", "post_id"),
+    )
 
     post_id: Mapped[int] = mapped_column(ForeignKey("posts.post_id"), primary_key=True)
     tag_id: Mapped[int] = mapped_column(ForeignKey("tags.tag_id"), primary_key=True)
@@ -75,7 +113,11 @@ class PostTag(Base):
 class PostImage(Base):
     __tablename__ = "post_images"
 
-    image_key: Mapped[str] = mapped_column(primary_key=True)
+    image_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, server_default=text("uuidv7()")
+    )
+    # ключ - хеш содержимого: одинаковые файлы разных публикаций ссылаются на один объект
+    image_key: Mapped[str] = mapped_column(index=True)
     post_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey(
             "posts.post_id",
@@ -84,3 +126,6 @@ class PostImage(Base):
         nullable=True,
     )
     post: Mapped["Post"] = relationship(back_populates="images")
+    # уменьшенные копии изображения: {название: {"key": ключ в S3, "width": ширина}},
+    # заполняются фоновой задачей после загрузки
+    variants: Mapped[dict | None] = mapped_column(JSONB)
@@ -2,6 +2,7 @@ import uuid
 from enum import StrEnum
 
 from sqlalchemy import String, Enum, UUID, text, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
 from . import Base
@@ -31,7 +32,11 @@ class User(Base):
 class AvatarImage(Base):
     __tablename__ = "user_images"
 
-    image_key: Mapped[str] = mapped_column(primary_key=True)
+    image_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, server_default=text("uuidv7()")
+    )
+    # ключ - хеш содержимого, см. PostImage.image_key
+    image_key: Mapped[str] = mapped_column(index=True)
     user_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey(
             "users.user_id",
@@ -40,3 +45,5 @@ class AvatarImage(Base):
         nullable=True,
     )
     user: Mapped["User"] = relationship(back_populates="images")
+    # уменьшенные копии изображения, см. PostImage.variants
+    variants: Mapped[dict | None] = mapped_column(JSONB)
@@ -5,6 +5,7 @@ __all__ = (
     "user_password_update",
     "administrator_create",
     "user_update",
+    "user_avatar_confirm",
     "create_user",
     "create_image",
     "S3ImageManager",
@@ -13,5 +14,5 @@ __all__ = (
 
 from .image_service import delete_images_without_post, create_image
 from .s3_services import s3storage_manager, S3ImageManager
-from .user_service import user_password_update, administrator_create, user_update, create_user
+from .user_service import user_password_update, administrator_create, user_update, user_avatar_confirm, create_user
 from .post_service import create_post, update_post
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import uuid
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from app.conf.redis_client import get_redis_client, create_redis_client
+from app.models import Post, PublishStatus, db_helper
+
+logger = logging.getLogger(__name__)
+
+# Индекс ленты опубликованных постов: sorted set, где у всех элементов score = 0,
+# поэтому элементы упорядочены лексикографически. Строковое представление uuidv7
+# упорядочено по времени создания, и страница ленты читается через ZRANGE BYLEX.
+FEED_KEY = "feed:published"
+# Признак того, что индекс построен. Redis работает без персистентности, и после
+# его перезапуска лента читается из базы, пока индекс не будет перестроен.
+FEED_READY_KEY = "feed:published:ready"
+REBUILD_BATCH_SIZE = 1000
+
+
+async def get_feed_page(
+    limit: int,
+    after: uuid.UUID | None = None,
+) -> tuple[list[uuid.UUID], bool] | None:
+    """
+    Возвращает post_id страницы ленты, от новых к старым, за один запрос к Redis.
+    :param after: post_id последней публикации предыдущей страницы
+    :return: идентификаторы и признак следующей страницы или None, если индекс не готов
+    """
+    start = f"({after}" if after else "+"
+    try:
+        async with get_redis_client().pipeline(transaction=False) as pipe:
+            pipe.exists(FEED_READY_KEY)
+            pipe.zrange(FEED_KEY, start, "-", desc=True, bylex=True, offset=0, num=limit + 1)
+            ready, members = await pipe.execute()
+    except RedisError as e:
+        logger.warning("feed index read failed: %s", e)
+        return None
+    if not ready:
+        return None
+    post_ids = [uuid.UUID(member.decode()) for member in members]
+    return post_ids[:limit], len(post_ids) > limit
+
+
+async def sync_post(post: Post) -> None:
+    """
+    Добавляет пост в индекс ленты или удаляет из него в зависимости от статуса.
+    Вызывается после фиксации смены статуса публикации.
+    """
+    try:
+        if post.publish_status == PublishStatus.published:
+            await get_redis_client().zadd(FEED_KEY, {str(post.post_id): 0})
+        else:
+            await get_redis_client().zrem(FEED_KEY, str(post.post_id))
+    except RedisError as e:
+        logger.warning("feed index update for post %s failed: %s", post.post_id, e)
+
+
+async def rebuild_feed_index(client: Redis | None = None) -> str:
+    """
+    Полностью перестраивает индекс ленты по базе данных: при холодном старте и для
+    исправления расхождений. Индекс собирается во временном ключе и атомарно
+    подменяет текущий, поэтому чтение ленты во время перестроения не прерывается.
+    :param client: клиент Redis; если не передан, создается на время перестроения
+    (для запуска из Celery и командной строки, где у каждого запуска свой event loop)
+    """
+    if client is None:
+        client = create_redis_client()
+        try:
+            return await rebuild_feed_index(client)
+        finally:
+            await client.aclose()
+    tmp_key = f"{FEED_KEY}:rebuild:{uuid.uuid4()}"
+    total = 0
+    async with db_helper.session_factory() as session:
+        stmt = (
+            select(Post.post_id)
+            .where(Post.publish_status == PublishStatus.published)
+            .execution_options(yield_per=REBUILD_BATCH_SIZE)
+        )
+        result = await session.stream_scalars(stmt)
+        async for partition in result.partitions():
+            await client.zadd(tmp_key, {str(post_id): 0 for post_id in partition})
+            total += len(partition)
+    async with client.pipeline(transaction=True) as pipe:
+        if total:
+            pipe.rename(tmp_key, FEED_KEY)
+        else:
+            pipe.delete(FEED_KEY)
+        pipe.set(FEED_READY_KEY, 1)
+        await pipe.execute()
+    return f"Feed index rebuilt with {total} published posts"
+
+
+async def ensure_feed_index() -> None:
+    """
+    Строит индекс ленты при старте приложения, если его еще нет.
+    """
+    try:
+        if not await get_redis_client().exists(FEED_READY_KEY):
+            logger.info(await rebuild_feed_index(get_redis_client()))
+    except RedisError as e:
+        logger.warning("feed index is unavailable, feed is served from database: %s", e)
+
+
+if __name__ == "__main__":
+    # python -m app.services.feed_index
+    print(asyncio.run(rebuild_feed_index()))
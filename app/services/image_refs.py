@@ -0,0 +1,48 @@
+from sqlalchemy import String, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import db_helper
+
+
+async def lock_image_keys(session: AsyncSession, image_keys: list[str]) -> None:
+    """
+    Берет транзакционные advisory-блокировки на ключи изображений. Загрузка файла с тем же
+    содержимым и удаление последней ссылки на него выполняются под этой блокировкой,
+    поэтому объект не удаляется из хранилища в момент, когда на него появляется новая запись.
+    Ключи блокируются в одном порядке, чтобы параллельные транзакции не ждали друг друга по кругу.
+    """
+    keys = func.unnest(
+        bindparam("image_keys", sorted(set(image_keys)), type_=ARRAY(String))
+    ).table_valued("image_key")
+    await session.execute(
+        select(func.pg_advisory_xact_lock(func.hashtext(keys.c.image_key))).select_from(keys)
+    )
+
+
+async def referenced_image_keys(session: AsyncSession, model, image_keys: list[str]) -> set[str]:
+    """
+    :return: ключи, на которые ссылается хотя бы одна запись изображения
+    """
+    result = await session.scalars(
+        select(model.image_key).where(model.image_key.in_(image_keys)).distinct()
+    )
+    return set(result.all())
+
+
+async def release_images(storage, model, image_keys: list[str]) -> None:
+    """
+    Удаляет из хранилища изображения (вместе с уменьшенными копиями), на которые больше
+    не ссылается ни одна запись model. Вызывается после фиксации транзакции, удалившей
+    записи, и при откате транзакции, загрузившей файл.
+    :param storage: S3ImageManager бакета изображений
+    :param model: PostImage или AvatarImage
+    :param image_keys: ключи, ссылки на которые были удалены
+    """
+    if not image_keys:
+        return
+    async with db_helper.session_factory() as session, session.begin():
+        await lock_image_keys(session, image_keys)
+        unreferenced = set(image_keys) - await referenced_image_keys(session, model, image_keys)
+        if unreferenced:
+            await storage.delete_images(sorted(unreferenced))
@@ -1,41 +1,41 @@
-from dotenv import load_dotenv
-from fastapi import UploadFile
+import uuid
+
+import jwt
+from fastapi import UploadFile, HTTPException, status
 from sqlalchemy import select, delete
 
-from app.api.images.crud import save_image, delete_image
-from app.conf.s3_client import s3client
-from app.models import db_helper, PostImage, AvatarImage, User, Post
-from app.services.s3_services import S3ImageManager
+from app.api.auth.utils_jwt import create_upload_token, decode_upload_token
+from app.api.images.crud import image_owner, save_image, delete_image
+from app.conf.s3_client import S3AsyncClient
+from app.models import db_helper, PostImage, AvatarImage, Post, after_commit, on_rollback
+from app.services.s3_services import S3ImageManager, PENDING_PREFIX
+from app.services import post_cache, user_cache
+from app.services.image_refs import lock_image_keys, release_images
+from app.services.image_variants import enqueue_variants
+from app.settings import settings
 
-# TODO: нужен рефактор
 async def delete_images_without_post():
-    async with db_helper.session_factory() as session:
-        stmt = select(PostImage.image_key).where(PostImage.post_id == None)
-        result = await session.execute(stmt)
-        non_post_images_keys = result.scalars().all()
-        stmt = select(AvatarImage.image_key).where(AvatarImage.user_id == None)
-        result = await session.execute(stmt)
-        non_user_images_keys = result.scalars().all()
-        if non_post_images_keys:
-            storage = S3ImageManager(
-                bucket_name="post-illustration-images",
-                client=await s3client.get_client(),
-            )
-            await storage.delete_objects(non_post_images_keys)
-            stmt = delete(PostImage).where(PostImage.post_id == None)
-            await session.execute(stmt)
-            await session.commit()
-        if non_user_images_keys:
-            storage = S3ImageManager(
-                bucket_name="users-avatar-images",
-                client=await s3client.get_client(),
+    """
+    Удаляет записи изображений, оставшихся без публикации или пользователя, и объекты
+    в хранилище, на которые больше никто не ссылается.
+    """
+    deleted = 0
+    # задача Celery выполняется в своем event loop, общий клиент приложения ей недоступен
+    async with db_helper.session_factory() as session, S3AsyncClient() as s3:
+        for bucket_name, model, owner_id in (
+            ("post-illustration-images", PostImage, PostImage.post_id),
+            ("users-avatar-images", AvatarImage, AvatarImage.user_id),
+        ):
+            result = await session.scalars(
+                delete(model).where(owner_id.is_(None)).returning(model.image_key)
             )
-            await storage.delete_objects(non_user_images_keys)
-            stmt = delete(AvatarImage).where(AvatarImage.user_id == None)
-            await session.execute(stmt)
+            image_keys = list(set(result.all()))
             await session.commit()
-            return f"Deleted {len(non_post_images_keys) + len(non_user_images_keys)} orphaned images"
-        return "No orphaned images found"
+            deleted += len(image_keys)
+            await release_images(S3ImageManager(bucket_name, s3.s3_client), model, image_keys)
+    if deleted:
+        return f"Deleted {deleted} orphaned images"
+    return "No orphaned images found"
 
 
 async def create_image(
@@ -44,31 +44,155 @@ async def create_image(
     storage,
     entity,
 ) -> PostImage:
-    image_key = await storage.put_object(file)
+    """
+    Сохраняет изображение под ключом из хеша содержимого. Если такой файл уже есть
+    в хранилище, он не загружается повторно, а новая запись получает его копии.
+    """
+    model, _, _, _ = image_owner(entity)
+    image_key, content_type = await storage.content_key(file)
+    # блокировка держится до конца транзакции запроса: удаление последней ссылки
+    # на этот файл дождется ее и увидит новую запись
+    await lock_image_keys(session, [image_key])
+    stored = await session.scalar(select(model).where(model.image_key == image_key).limit(1))
+    if stored is None:
+        await storage.put_object(file, image_key, content_type)
+        # если транзакция запроса откатится, загруженный объект удаляется из хранилища
+        on_rollback(session, release_images, storage, model, [image_key])
+    image = await save_image(image_key, session, entity)
+    if stored is not None:
+        image.variants = stored.variants
+    image.image_url = await storage.generate_url(image_key)
+    await session.flush()
+    if image.variants is None:
+        after_commit(session, enqueue_variants, storage.bucket_name, image_key)
+    return image
+
+
+async def create_upload_url(
+    file_name: str,
+    content_type: str,
+    user_id: uuid.UUID,
+    storage,
+    entity,
+) -> dict:
+    """
+    Выдает политику прямой загрузки изображения в хранилище и токен для ее подтверждения.
+    :param file_name: имя файла, из него берется расширение ключа
+    :param content_type: Content-Type файла, один из UPLOAD_IMAGE_TYPES
+    :param user_id: пользователь, который загружает файл
+    :param storage: S3ImageManager бакета, в который загружается файл
+    :param entity: публикация или пользователь, к которому относится изображение
+    :return: адрес и поля формы загрузки, ключ объекта и токен подтверждения
+    :raise HTTPException: 400, если Content-Type не поддерживается
+    """
+    if content_type not in settings.upload_image_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported content type, expected one of: {', '.join(settings.upload_image_types)}",
+        )
+    _, _, entity_id, _ = image_owner(entity)
+    key = storage.generate_uuid_key(PENDING_PREFIX, file_name)
+    presigned = await storage.generate_presigned_post(key, content_type, settings.upload_url_expire)
+    return {
+        **presigned,
+        "image_key": key,
+        "upload_token": create_upload_token(user_id, storage.bucket_name, key, entity_id),
+        "expires_in": settings.upload_url_expire,
+    }
+
+
+async def confirm_upload(
+    upload_token: str,
+    user_id: uuid.UUID,
+    session,
+    storage,
+    entity,
+):
+    """
+    Подтверждает прямую загрузку: проверяет токен и загруженный объект, публикует его
+    под постоянным ключом и создает запись PostImage или AvatarImage.
+    :param upload_token: токен, выданный вместе с политикой загрузки
+    :param user_id: пользователь, который подтверждает загрузку
+    :param session: сессия запроса
+    :param storage: S3ImageManager бакета, в который загружен файл
+    :param entity: публикация или пользователь, к которому относится изображение
+    :return: созданная запись изображения с image_url
+    :raise HTTPException: 401, если токен выдан не для этого пользователя, бакета или
+        сущности; 409, если загрузка уже подтверждена; ошибки проверки объекта
+    """
+    try:
+        claims = decode_upload_token(upload_token)
+    except jwt.InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="unauthorized",
+        ) from None
+    model, _, entity_id, _ = image_owner(entity)
+    if (
+        claims.get("uid") != str(user_id)
+        or claims.get("bucket") != storage.bucket_name
+        or claims.get("ref") != str(entity_id)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="unauthorized",
+        )
+    pending_key = claims.get("key", "")
+    if not pending_key.startswith(PENDING_PREFIX):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="unauthorized",
+        )
+    image_key = pending_key.removeprefix(PENDING_PREFIX)
+    await lock_image_keys(session, [image_key])
+    if await session.scalar(select(model.image_id).where(model.image_key == image_key).limit(1)):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"image {image_key} is already confirmed",
+        )
+    content_type = await storage.validate_uploaded_image(pending_key)
+    await storage.promote_upload(pending_key, content_type)
+    # при откате опубликованная копия удаляется, закрытая остается до очистки
+    on_rollback(session, release_images, storage, model, [image_key])
     image = await save_image(image_key, session, entity)
     image.image_url = await storage.generate_url(image_key)
-    await session.commit()
+    await session.flush()
+    after_commit(session, storage.delete_object, pending_key)
+    after_commit(session, enqueue_variants, storage.bucket_name, image_key)
     return image
 
 
+async def delete_expired_pending_uploads():
+    """
+    Удаляет из хранилища прямые загрузки, которые не подтвердили, пока действовал
+    токен загрузки.
+    """
+    deleted = 0
+    # задача Celery выполняется в своем event loop, общий клиент приложения ей недоступен
+    async with S3AsyncClient() as s3:
+        for bucket_name in ("post-illustration-images", "users-avatar-images"):
+            storage = S3ImageManager(bucket_name, s3.s3_client)
+            deleted += await storage.delete_expired_pending(settings.upload_token_expire)
+    if deleted:
+        return f"Deleted {deleted} unconfirmed uploads"
+    return "No unconfirmed uploads found"
+
+
 async def image_delete(
     entity,
     session,
     storage,
 ):
-    if type(entity) == User:
-        model = AvatarImage
-        image_key = entity.profile_image
-        image_field = "profile_image"
-    elif type(entity) == Post:
-        model = PostImage
-        image_key = entity.post_image
-        image_field = "post_image"
-    else:
-        raise TypeError(f"Expected User or Post, got {type(entity).__name__}")
-    await storage.delete_object(image_key)
-    await delete_image(image_key, session, model)
+    model, _, _, image_field = image_owner(entity)
+    image_key = getattr(entity, image_field)
+    await delete_image(image_key, session, entity)
     setattr(entity, image_field, None)
     session.add(entity)
-    await session.commit()
+    await session.flush()
+    # удаление из хранилища не откатить, поэтому оно выполняется после фиксации транзакции
+    after_commit(session, release_images, storage, model, [image_key])
+    if isinstance(entity, Post):
+        after_commit(session, post_cache.invalidate_post, entity.post_id)
+    else:
+        after_commit(session, user_cache.invalidate_user, entity.user_id)
     return entity
@@ -0,0 +1,152 @@
+import asyncio
+import io
+
+from redis.asyncio import Redis
+from sqlalchemy import select, update
+
+from app.conf.redis_client import create_redis_client
+from app.conf.s3_client import S3AsyncClient
+from app.models import AvatarImage, PostImage, db_helper
+from app.services import post_cache, user_cache
+from app.services.image_refs import release_images
+from app.services.s3_services import IMMUTABLE_CACHE_CONTROL, S3ImageManager, VARIANT_FORMATS, variant_key
+from app.settings import settings
+
+BUCKET_MODELS = {
+    "post-illustration-images": PostImage,
+    "users-avatar-images": AvatarImage,
+}
+
+
+def render_variants(data: bytes) -> dict[str, tuple[bytes, int]]:
+    """
+    Уменьшает изображение до ширин из IMAGE_VARIANTS с сохранением пропорций.
+    Изображение не увеличивается: если оригинал уже, чем несколько вариантов, создается
+    одна копия в размере оригинала под названием наименьшего из них.
+    EXIF в копии не переносится, ориентация из него применяется к пикселям заранее.
+    :param data: содержимое оригинала
+    :return: {название: (содержимое копии, ширина)}
+    """
+    # Pillow нужен только воркеру Celery, приложение его не импортирует
+    from PIL import Image, ImageOps
+
+    pil_format, _, _ = VARIANT_FORMATS[settings.image_variant_format]
+    rendered = {}
+    widths = set()
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        icc_profile = original.info.get("icc_profile")
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        if has_alpha and pil_format == "JPEG":
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        for name, width in sorted(settings.image_variants.items(), key=lambda item: item[1]):
+            variant = image.copy()
+            variant.thumbnail((width, image.height))
+            if variant.width in widths:
+                continue
+            widths.add(variant.width)
+            buffer = io.BytesIO()
+            variant.save(
+                buffer,
+                pil_format,
+                quality=settings.image_variant_quality,
+                optimize=True,
+                icc_profile=icc_profile,
+            )
+            rendered[name] = (buffer.getvalue(), variant.width)
+    return rendered
+
+
+async def generate_variants(bucket_name: str, image_key: str, client: Redis | None = None) -> str:
+    """
+    Создает уменьшенные копии загруженного изображения, кладет их в хранилище рядом с
+    оригиналом и записывает в поле variants записи изображения. Выполняется в задаче Celery.
+    :param bucket_name: бакет оригинала
+    :param image_key: ключ оригинала
+    :param client: клиент Redis для инвалидации кэшей; если не передан, создается на время
+    выполнения (у каждого запуска задачи свой event loop)
+    """
+    if client is None:
+        client = create_redis_client()
+        try:
+            return await generate_variants(bucket_name, image_key, client)
+        finally:
+            await client.aclose()
+    model = BUCKET_MODELS[bucket_name]
+    _, content_type, _ = VARIANT_FORMATS[settings.image_variant_format]
+    async with S3AsyncClient() as s3:
+        storage = S3ImageManager(bucket_name, s3.s3_client)
+        original = await s3.s3_client.get_object(Bucket=bucket_name, Key=image_key)
+        async with original["Body"] as body:
+            data = await body.read()
+        rendered = render_variants(data)
+        variants = {}
+        for name, (content, width) in rendered.items():
+            key = variant_key(image_key, name)
+            await s3.s3_client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=content,
+                ContentType=content_type,
+                CacheControl=IMMUTABLE_CACHE_CONTROL,
+                ACL=storage.default_acl,
+            )
+            variants[name] = {"key": key, "width": width}
+        # варианты шире оригинала ссылаются на его копию в исходном размере
+        largest = max(variants.values(), key=lambda variant: variant["width"])
+        for name in settings.image_variants:
+            variants.setdefault(name, largest)
+        owner_id = model.post_id if model is PostImage else model.user_id
+        # копии общие для всех записей с этим ключом (одинаковым содержимым)
+        async with db_helper.session_factory() as session:
+            result = await session.execute(
+                update(model)
+                .where(model.image_key == image_key)
+                .values(variants=variants)
+                .returning(owner_id)
+            )
+            owners = result.scalars().all()
+            await session.commit()
+        if not owners:
+            # изображение удалили, пока создавались копии
+            await release_images(storage, model, [image_key])
+            return f"Image {image_key} was deleted, variants discarded"
+    invalidate = post_cache.invalidate_post if model is PostImage else user_cache.invalidate_user
+    await asyncio.gather(
+        *(invalidate(owner, client) for owner in {owner for owner in owners if owner is not None})
+    )
+    return f"Created {len(rendered)} variants of {image_key}"
+
+
+async def enqueue_variants(bucket_name: str, image_key: str) -> None:
+    """
+    Ставит в очередь создание копий изображения. Вызывается после фиксации транзакции,
+    чтобы задача нашла запись изображения в базе.
+    """
+    # модуль задач импортирует Celery, поэтому загружается только при постановке задачи
+    from app.tasks.task import generate_image_variants_task
+
+    generate_image_variants_task.delay(bucket_name, image_key)
+
+
+async def enqueue_missing_variants() -> str:
+    """
+    Ставит в очередь создание копий для изображений, у которых их еще нет
+    (загруженных до появления копий или с неудавшейся задачей).
+    """
+    queued = 0
+    async with db_helper.session_factory() as session:
+        for bucket_name, model in BUCKET_MODELS.items():
+            image_keys = await session.scalars(select(model.image_key).where(model.variants.is_(None)))
+            for image_key in image_keys:
+                await enqueue_variants(bucket_name, image_key)
+                queued += 1
+    return f"Queued variants for {queued} images"
+
+
+if __name__ == "__main__":
+    # python -m app.services.image_variants
+    print(asyncio.run(enqueue_missing_variants()))
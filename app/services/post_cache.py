@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import uuid
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.api.posts.etag import post_etag
+from app.api.posts.schemas import PostResponse
+from app.conf.redis_client import get_redis_client
+from app.models import Post, db_helper
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+POST_CACHE_TTL = settings.post_cache_ttl
+# через сколько секунд после изменения пост удаляется из кэша повторно, если чтение
+# идет с реплик: ответ, прочитанный с отстающей реплики, мог снова попасть в кэш
+POST_CACHE_REPLICA_DELAY = settings.post_cache_replica_delay
+
+_delayed_invalidations: set[asyncio.Task] = set()
+
+
+def _post_key(post_id: uuid.UUID) -> str:
+    return f"post_response:{post_id}"
+
+
+async def get_cached_post(post_id: uuid.UUID) -> tuple[str, bytes] | None:
+    """
+    Возвращает ETag и сериализованный PostResponse опубликованного поста из кэша.
+    При недоступности Redis возвращает None, и запрос уходит в базу.
+    """
+    try:
+        etag, body = await get_redis_client().hmget(_post_key(post_id), ["etag", "body"])
+    except RedisError as e:
+        logger.warning("post cache read failed: %s", e)
+        return None
+    if etag is None or body is None:
+        return None
+    return etag.decode(), body
+
+
+async def cache_post(post: Post) -> None:
+    """
+    Кладет в кэш ответ по опубликованному посту вместе с его ETag. Ссылка на изображение
+    должна быть уже сгенерирована. Посты в остальных статусах не кэшируются.
+    """
+    if post.publish_status != "published":
+        return
+    etag = post_etag(post)
+    payload = PostResponse.model_validate(post).model_dump_json()
+    key = _post_key(post.post_id)
+    try:
+        async with get_redis_client().pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={"etag": etag, "body": payload})
+            pipe.expire(key, POST_CACHE_TTL)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("post cache write failed: %s", e)
+
+
+async def _delete_post(post_id: uuid.UUID, client: Redis | None = None) -> None:
+    try:
+        await (client or get_redis_client()).delete(_post_key(post_id))
+    except RedisError as e:
+        logger.warning("post cache invalidation failed: %s", e)
+
+
+async def _delete_post_later(post_id: uuid.UUID, client: Redis | None = None) -> None:
+    await asyncio.sleep(POST_CACHE_REPLICA_DELAY)
+    await _delete_post(post_id, client)
+
+
+async def invalidate_post(post_id: uuid.UUID, client: Redis | None = None) -> None:
+    """
+    Удаляет пост из кэша. Вызывается после каждого изменения поста.
+    :param client: клиент Redis задачи Celery. У каждого запуска задачи свой event loop,
+    который закрывается по ее завершении, поэтому повторное удаление выполняется
+    в самой задаче, а не в фоне
+    """
+    await _delete_post(post_id, client)
+    if not db_helper.replicas:
+        return
+    if client is not None:
+        await _delete_post_later(post_id, client)
+        return
+    task = asyncio.create_task(_delete_post_later(post_id))
+    _delayed_invalidations.add(task)
+    task.add_done_callback(_delayed_invalidations.discard)
@@ -1,11 +1,32 @@
+import re
+from datetime import datetime, UTC
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 
 from app.api.images.crud import delete_image
+from app.api.posts import crud as posts_crud
+from app.services.image_refs import release_images
 from app.services.image_service import create_image
 from app.api.posts.schemas import PostUpdate, PostUpdatePartial
-from app.models import Post, PostImage
+from app.models import Post, PostImage, after_commit
 from app.services.s3_services import S3ImageManager
+from app.services import post_cache, feed_index
+
+EXCERPT_LENGTH = 280
+
+
+def make_excerpt(content: str) -> str:
+    """
+    Формирует анонс поста для списков: текст без изображений и разметки ссылок,
+    обрезанный по границе слова.
+    """
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", content or "")
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    text = " ".join(text.split())
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    return text[:EXCERPT_LENGTH].rsplit(" ", 1)[0] + "…"
 
 
 async def create_post(
@@ -14,8 +35,10 @@ async def create_post(
     request: Request,
     client,
 ) -> Post:
-    post = Post(**post_in.model_dump(exclude={"post_image"}))
+    post = Post(**post_in.model_dump(exclude={"post_image", "pinned_tags"}))
     post.author_id = request.state.user_id
+    post.excerpt = make_excerpt(post.content)
+    post.pinned_tags = await posts_crud.get_or_create_tags(session, post_in.pinned_tags)
     session.add(post)
     await session.flush()
     if post_in.post_image:
@@ -23,11 +46,9 @@ async def create_post(
         image = await create_image(post_in.post_image, session, storage, post)
         post.post_image = image.image_key
         session.add(post)
-        await session.commit()
+        await session.flush()
         post.post_image = image.image_url
         return post
-    session.add(post)
-    await session.commit()
     return post
 
 
@@ -38,17 +59,28 @@ async def update_post(
     client,
     partial: bool = False,
 ) -> Post:
+    previous_status = post.publish_status
     for field, value in post_update.model_dump(exclude_unset=partial).items():
         if field == "post_image" and value:
             storage = S3ImageManager("post-illustration-images", client)
             if image_key := post.post_image:
-                await storage.delete_object(image_key)
-                await delete_image(image_key, session, PostImage)
+                await delete_image(image_key, session, post)
+                after_commit(session, release_images, storage, PostImage, [image_key])
             post.image = await create_image(post_update.post_image, session, storage, post)
             setattr(post, field, post.image.image_key)
+        elif field == "pinned_tags" and value:
+            post.pinned_tags = await posts_crud.get_or_create_tags(session, value)
         elif value:
             setattr(post, field, value)
+    if post_update.content:
+        post.excerpt = make_excerpt(post.content)
+    # время изменения задается явно: оно нужно для ETag в ответе, а значение по умолчанию
+    # из базы пришлось бы перечитывать отдельным запросом; теги хранятся в posts_tags,
+    # и без этого их изменение не обновило бы строку поста
+    post.updated_at = datetime.now(UTC).replace(tzinfo=None)
     session.add(post)
-    await session.commit()
-    await session.refresh(post)
+    await session.flush()
+    after_commit(session, post_cache.invalidate_post, post.post_id)
+    if post.publish_status != previous_status:
+        after_commit(session, feed_index.sync_post, post)
     return post
@@ -1,23 +1,60 @@
+import contextlib
+import hashlib
 import json
 import os
 import uuid
+from datetime import datetime, timedelta, UTC
 
-from botocore.exceptions import ClientError
-from dotenv import load_dotenv
 from fastapi import UploadFile, HTTPException
 from filetype import filetype
 
-from app.conf.s3_client import S3AsyncClient
+from app.conf.s3_client import s3client
+from app.settings import settings
 
-load_dotenv()
+# формат уменьшенных копий: формат Pillow, Content-Type, расширение ключа
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+# объекты по ключу не перезаписываются, поэтому Caddy и браузеры могут кэшировать их бессрочно
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# DeleteObjects принимает не больше 1000 ключей за запрос
+DELETE_BATCH_SIZE = 1000
+# прямые загрузки попадают сюда, закрытыми, и публикуются только после подтверждения
+PENDING_PREFIX = "pending/"
+
+
+def _client_error() -> type[Exception]:
+    """
+    botocore.exceptions.ClientError. botocore импортируется долго, поэтому вместе
+    с клиентом S3, при первой ошибке обращения к хранилищу, а не при импорте модуля.
+    """
+    from botocore.exceptions import ClientError
+
+    return ClientError
+
+
+def variant_key(image_key: str, name: str) -> str:
+    """
+    Ключ уменьшенной копии изображения. Ключи копий выводятся из ключа оригинала,
+    поэтому при удалении изображения их не нужно читать из базы.
+    """
+    base_name, _ = os.path.splitext(image_key)
+    return f"variants/{base_name}/{name}.{VARIANT_FORMATS[settings.image_variant_format][2]}"
+
+
+def variant_keys(image_key: str) -> list[str]:
+    return [variant_key(image_key, name) for name in settings.image_variants]
 
 
 class S3ImageManager:
 
     def __init__(self, bucket_name: str, client, default_acl: str = "public-read"):
-        self.url = os.getenv("NEXT_PUBLIC_SITE_URL")
+        self.url = settings.next_public_site_url
         self.bucket_name = bucket_name
         self.default_acl = default_acl
+        self.chunk_size = settings.upload_chunk_size
+        self.max_size = settings.upload_max_size
         self._validate_instance_attributes()
         self.client = client
 
@@ -46,41 +83,81 @@ class S3ImageManager:
         return path
 
     @staticmethod
-    async def _read_file(file: UploadFile) -> tuple[bytes, str]:
+    async def _read_chunk(file: UploadFile, size: int) -> bytes:
         """
-        Читает содержимое файла и возвращает его содержимое и имя файла.
+        Читает из файла до size байт, дочитывая, пока чанк не заполнится или файл не закончится.
 
         Аргументы:
         - file (`UploadFile`): Загружаемый файл.
+        - size (`int`): Размер чанка в байтах.
 
         Возвращает:
-        - `tuple[bytes, str]`: Кортеж, содержащий байты файла и его имя.
+        - `bytes`: Очередной чанк, пустой в конце файла.
         """
-        file_content = await file.read()
-        file_name = file.filename
-        return file_content, file_name
-
-    async def _generate_unique_uuid_key(self, path: str, file_name: str) -> str | None:
+        chunk = await file.read(size)
+        while chunk and len(chunk) < size:
+            tail = await file.read(size - len(chunk))
+            if not tail:
+                break
+            chunk += tail
+        return chunk
+
+    def generate_uuid_key(self, path: str, file_name: str) -> str:
         """
-        Генерирует уникальный ключ для файла в S3, на базе UUIDv4.
+        Генерирует случайный ключ для файла, содержимое которого API не видит (прямая загрузка).
+        Совпадение UUIDv4 практически невозможно, поэтому наличие объекта не проверяется.
 
         Аргументы:
-        - s3_client: Клиент S3, используемый для взаимодействия с сервисом.
         - path ('str'): Путь до файла
         - file_name (`str`): Предлагаемое имя файла.
 
         Возвращает:
-        - `str`: Уникальный ключ для файла в S3.
+        - `str`: Ключ для файла в S3.
         """
         base_name, extension = os.path.splitext(file_name)
-        key = path + f"{uuid.uuid4()}{extension}"
-        try:
-            await self.client.head_object(Bucket=self.bucket_name, Key=key)
-        except ClientError as e:
-            if e.response["Error"]["Code"] == "404":
-                return key
-            else:
-                raise  # Добавить исключение с предложением попробовать создать еще раз
+        return self._prepare_path(path) + f"{uuid.uuid4()}{extension}"
+
+    async def content_key(self, file: UploadFile, path: str = "", file_type: str = "image") -> tuple[str, str | None]:
+        """
+        Вычисляет ключ файла по SHA-256 его содержимого: одинаковые файлы получают один ключ
+        и хранятся один раз. Файл читается чанками по UPLOAD_CHUNK_SIZE, тип определяется по
+        первому чанку, размер проверяется по ходу чтения. После чтения файл перематывается
+        в начало для загрузки.
+
+        Аргументы:
+        - file (`UploadFile`): Загружаемый файл.
+        - path (`str`, optional): Путь в бакете для размещения файла. По умолчанию "".
+        - file_type (`str`, optional): Тип файла. По умолчанию "image".
+
+        Возвращает:
+        - `tuple[str, str | None]`: Ключ объекта и Content-Type файла, если его удалось определить.
+
+        Исключения:
+        - HTTPException: 400, если файл не изображение; 413, если файл больше UPLOAD_MAX_SIZE.
+        """
+        if file.size is not None and file.size > self.max_size:
+            raise self._too_large()
+        chunk = await self._read_chunk(file, self.chunk_size)
+        # сигнатуры форматов filetype ищет в первых 262 байтах, первого чанка достаточно
+        kind = filetype.guess(chunk[:262])
+        is_image = kind is not None and kind.mime.startswith("image")
+        if file_type == "image":
+            if not is_image:
+                raise HTTPException(status_code=400, detail="Invalid image file")
+        digest = hashlib.sha256()
+        total_size = 0
+        while chunk:
+            total_size += len(chunk)
+            if total_size > self.max_size:
+                raise self._too_large()
+            digest.update(chunk)
+            chunk = await self._read_chunk(file, self.chunk_size)
+        await file.seek(0)
+        if kind is not None:
+            extension = f".{kind.extension}"
+        else:
+            base_name, extension = os.path.splitext(file.filename or "")
+        return self._prepare_path(path) + digest.hexdigest() + extension, kind.mime if kind else None
 
     async def generate_url(self, key: str, expiration: int = 3600) -> str:
         """
@@ -103,45 +180,310 @@ class S3ImageManager:
                 ExpiresIn=expiration,
             )
             return url
-        except ClientError as e:
+        except _client_error() as e:
             raise HTTPException(
                 status_code=500, detail="Error generating presigned URL"
             ) from e
 
-    async def put_object(self, file: UploadFile, path: str = "", file_type: str = "image") -> str:
+    async def generate_presigned_post(self, key: str, content_type: str, expiration: int) -> dict:
+        """
+        Создает подписанную политику POST, по которой клиент загружает файл прямо в
+        хранилище, минуя API. Политика ограничивает ключ, Content-Type, ACL и размер файла.
+        Объект загружается закрытым под префикс PENDING_PREFIX и публикуется только
+        в promote_upload, после проверки. Подпись POST не зависит от хоста, поэтому
+        адрес формы переписывается на публичный адрес хранилища за Caddy.
+
+        Аргументы:
+        - key (`str`): Ключ объекта в S3 с префиксом PENDING_PREFIX.
+        - content_type (`str`): Content-Type, с которым клиент обязан загрузить файл.
+        - expiration (`int`): Срок действия политики в секундах.
+
+        Возвращает:
+        - `dict`: Адрес формы (`url`) и поля (`fields`), которые нужно отправить вместе с файлом.
+        """
+        fields = {
+            "Content-Type": content_type,
+            "acl": "private",
+        }
+        conditions = [
+            {"Content-Type": content_type},
+            {"acl": "private"},
+            ["content-length-range", 1, self.max_size],
+        ]
+        try:
+            presigned = await self.client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=key,
+                Fields=fields,
+                Conditions=conditions,
+                ExpiresIn=expiration,
+            )
+        except _client_error() as e:
+            raise HTTPException(
+                status_code=500, detail="Error generating presigned POST"
+            ) from e
+        return {"url": f"{self.url}/s3/{self.bucket_name}", "fields": presigned["fields"]}
+
+    async def validate_uploaded_image(self, key: str) -> str:
+        """
+        Проверяет файл, загруженный клиентом напрямую: объект существует, не больше
+        UPLOAD_MAX_SIZE, а его первые байты - изображение (Content-Type из формы задает
+        клиент, поэтому ему не доверяем). Объект, не прошедший проверку, удаляется.
+
+        Аргументы:
+        - key (`str`): Ключ объекта в S3.
+
+        Возвращает:
+        - `str`: Content-Type изображения, определенный по содержимому.
+
+        Исключения:
+        - HTTPException: 404, если объект не загружен; 413, если он больше
+          UPLOAD_MAX_SIZE; 400, если это не изображение.
+        """
+        try:
+            head = await self.client.head_object(Bucket=self.bucket_name, Key=key)
+        except _client_error() as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise HTTPException(status_code=404, detail="Uploaded file not found") from e
+            raise HTTPException(
+                status_code=500, detail="Error reading file from S3"
+            ) from e
+        if head["ContentLength"] > self.max_size:
+            await self.delete_object(key)
+            raise self._too_large()
+        try:
+            obj = await self.client.get_object(Bucket=self.bucket_name, Key=key, Range="bytes=0-261")
+            async with obj["Body"] as body:
+                head_bytes = await body.read()
+        except _client_error() as e:
+            raise HTTPException(
+                status_code=500, detail="Error reading file from S3"
+            ) from e
+        kind = filetype.guess(head_bytes)
+        if kind is None or not kind.mime.startswith("image"):
+            await self.delete_object(key)
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        return kind.mime
+
+    async def promote_upload(self, pending_key: str, content_type: str) -> str:
         """
-        Асинхронно загружает файл в S3 бакет и возвращает ключ (имя) объекта в хранилище.
+        Публикует проверенную прямую загрузку: копирует объект из PENDING_PREFIX под
+        постоянный ключ с ACL бакета и Cache-Control на год. Закрытая копия остается
+        до удаления вызывающим кодом или delete_expired_pending.
+
+        Аргументы:
+        - pending_key (`str`): Ключ загруженного объекта с префиксом PENDING_PREFIX.
+        - content_type (`str`): Content-Type опубликованного объекта.
+
+        Возвращает:
+        - `str`: Постоянный ключ объекта.
+
+        Исключения:
+        - HTTPException: Возникает при ошибке копирования объекта в S3.
+        """
+        key = pending_key.removeprefix(PENDING_PREFIX)
+        try:
+            await self.client.copy_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                CopySource={"Bucket": self.bucket_name, "Key": pending_key},
+                MetadataDirective="REPLACE",
+                **self._object_params(content_type),
+            )
+        except _client_error() as e:
+            raise HTTPException(
+                status_code=500, detail="Error publishing file in S3"
+            ) from e
+        return key
+
+    async def delete_expired_pending(self, max_age: int) -> int:
+        """
+        Удаляет неподтвержденные прямые загрузки из PENDING_PREFIX старше max_age секунд.
+
+        Аргументы:
+        - max_age (`int`): Возраст объекта в секундах, после которого его уже нельзя подтвердить.
+
+        Возвращает:
+        - `int`: Число удаленных объектов.
+        """
+        cutoff = datetime.now(UTC) - timedelta(seconds=max_age)
+        expired = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=self.bucket_name, Prefix=PENDING_PREFIX):
+            expired.extend(
+                obj["Key"] for obj in page.get("Contents", []) if obj["LastModified"] < cutoff
+            )
+        for start in range(0, len(expired), DELETE_BATCH_SIZE):
+            await self.delete_objects(expired[start:start + DELETE_BATCH_SIZE])
+        return len(expired)
+
+    async def put_object(self, file: UploadFile, key: str, content_type: str | None = None) -> str:
+        """
+        Асинхронно загружает файл в S3 бакет под заданным ключом, ключ получают из content_key.
+        Файл читается чанками по UPLOAD_CHUNK_SIZE: если он умещается в один чанк,
+        загружается одним put_object, иначе - multipart upload по чанку на часть.
+        В памяти одновременно не больше двух чанков. Содержимое объекта по ключу никогда
+        не меняется, поэтому он отдается с Cache-Control на год.
 
         Аргументы:
         - file (`UploadFile`): Загружаемый файл.
-        - path (`str`, optional): Путь в бакете для размещения файла. По умолчанию "".
-        - file_type (`str`, optional): Тип файла. По умолчанию "image".
+        - key (`str`): Ключ объекта в S3.
+        - content_type (`str | None`, optional): Content-Type объекта.
 
         Возвращает:
         - `str`: Ключ (имя) объекта в S3.
         """
-        file_content, file_name = await self._read_file(file)
-        kind = filetype.guess(file_content)
-        is_image = kind is not None and kind.mime.startswith("image")
-        if file_type == "image":
-            if not is_image:
-                raise HTTPException(status_code=400, detail="Invalid image file")
-        path = self._prepare_path(path)
-        key = await self._generate_unique_uuid_key(path, file_name)
+        chunk = await self._read_chunk(file, self.chunk_size)
+        next_chunk = await self._read_chunk(file, self.chunk_size)
+        object_params = self._object_params(content_type)
+        if not next_chunk:
+            try:
+                await self.client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    Body=chunk,
+                    **object_params,
+                )
+            except _client_error() as e:
+                raise HTTPException(
+                    status_code=500, detail="Error uploading file to S3"
+                ) from e
+            return key
+        await self._multipart_upload(key, file, chunk, next_chunk, object_params)
+        return key
+
+    def _object_params(self, content_type: str | None) -> dict:
+        params = {"ACL": self.default_acl, "CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            params["ContentType"] = content_type
+        return params
+
+    async def _multipart_upload(
+        self, key: str, file: UploadFile, chunk: bytes, next_chunk: bytes, object_params: dict
+    ) -> None:
+        """
+        Загружает файл по частям, начиная с двух уже прочитанных чанков. При ошибке
+        или превышении размера незавершенная загрузка отменяется, чтобы части не
+        оставались в хранилище.
+
+        Аргументы:
+        - key (`str`): Ключ объекта в S3.
+        - file (`UploadFile`): Загружаемый файл, дочитывается по мере загрузки частей.
+        - chunk (`bytes`): Первый чанк файла.
+        - next_chunk (`bytes`): Второй чанк файла.
+        - object_params (`dict`): ACL и заголовки объекта.
+        """
         try:
-            await self.client.put_object(
+            upload = await self.client.create_multipart_upload(
                 Bucket=self.bucket_name,
                 Key=key,
-                Body=file_content,
-                ACL=self.default_acl,
+                **object_params,
             )
-        except ClientError as e:
+        except _client_error() as e:
             raise HTTPException(
                 status_code=500, detail="Error uploading file to S3"
             ) from e
+        upload_id = upload["UploadId"]
+        try:
+            parts = await self._upload_parts(key, upload_id, file, chunk, next_chunk)
+            await self.client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException as e:
+            with contextlib.suppress(_client_error()):
+                await self.client.abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=key, UploadId=upload_id
+                )
+            if isinstance(e, _client_error()):
+                raise HTTPException(
+                    status_code=500, detail="Error uploading file to S3"
+                ) from e
+            raise
 
-        return key
+    async def _upload_parts(
+        self, key: str, upload_id: str, file: UploadFile, chunk: bytes, next_chunk: bytes
+    ) -> list[dict]:
+        """
+        Загружает части multipart upload по чанку, дочитывая файл на одну часть вперед:
+        так известно, какая часть последняя.
+
+        Аргументы:
+        - key (`str`): Ключ объекта в S3.
+        - upload_id (`str`): Идентификатор multipart upload.
+        - file (`UploadFile`): Загружаемый файл.
+        - chunk (`bytes`): Первый чанк файла.
+        - next_chunk (`bytes`): Второй чанк файла.
+
+        Возвращает:
+        - `list[dict]`: Номера и ETag загруженных частей для complete_multipart_upload.
+
+        Исключения:
+        - HTTPException: 413, если файл больше UPLOAD_MAX_SIZE.
+        """
+        parts = []
+        total_size = len(chunk)
+        while chunk:
+            part = await self.client.upload_part(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=chunk,
+            )
+            parts.append({"PartNumber": len(parts) + 1, "ETag": part["ETag"]})
+            chunk, next_chunk = next_chunk, b""
+            if chunk:
+                next_chunk = await self._read_chunk(file, self.chunk_size)
+                total_size += len(chunk)
+                if total_size > self.max_size:
+                    raise self._too_large()
+        return parts
+
+    async def generate_srcset(self, variants: dict | None) -> str | None:
+        """
+        Собирает значение атрибута srcset из уменьшенных копий изображения.
 
+        Аргументы:
+        - variants (`dict | None`): Копии изображения из поля variants записи изображения.
+
+        Возвращает:
+        - `str | None`: Ссылки на копии с их шириной, от меньшей к большей, или None,
+          если копии еще не готовы.
+        """
+        if not variants:
+            return None
+        keys_by_width = {variant["width"]: variant["key"] for variant in variants.values()}
+        return ", ".join(
+            [f"{await self.generate_url(key)} {width}w" for width, key in sorted(keys_by_width.items())]
+        )
+
+    async def delete_image(self, key: str) -> None:
+        """
+        Удаляет изображение вместе с его уменьшенными копиями.
+
+        Аргументы:
+        - key (`str`): Ключ оригинала в S3.
+        """
+        await self.delete_images([key])
+
+    async def delete_images(self, keys: list) -> None:
+        """
+        Удаляет изображения вместе с их уменьшенными копиями, пачками по DELETE_BATCH_SIZE ключей.
+
+        Аргументы:
+        - keys (`list`): Ключи оригиналов в S3.
+        """
+        objects_keys = [object_key for key in keys for object_key in (key, *variant_keys(key))]
+        for start in range(0, len(objects_keys), DELETE_BATCH_SIZE):
+            await self.delete_objects(objects_keys[start:start + DELETE_BATCH_SIZE])
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413, detail=f"File is larger than {self.max_size} bytes"
+        )
 
     async def delete_object(self, key: str) -> None:
         """
@@ -155,7 +497,7 @@ class S3ImageManager:
         """
         try:
             await self.client.delete_object(Bucket=self.bucket_name, Key=key)
-        except ClientError as e:
+        except _client_error() as e:
             error_code = e.response["Error"]["Code"]
             if error_code != "NoSuchKey":
                 raise HTTPException(
@@ -179,7 +521,7 @@ class S3ImageManager:
                         "Quiet": False,  # Измените на True, чтобы не получать информацию о каждом объекте. True значение по дефолту. В варианте с minio не работает
                     },
                 )
-        except ClientError as e:
+        except _client_error() as e:
             error_code = e.response["Error"]["Code"]
             if error_code != "NoSuchKey":
                 raise HTTPException(
@@ -188,7 +530,6 @@ class S3ImageManager:
 
 
 class S3StorageManager:
-    s3client = S3AsyncClient()
     buckets = [
         "post-illustration-images",
         "users-avatar-images",
@@ -209,7 +550,15 @@ class S3StorageManager:
                         f"arn:aws:s3:::{bucket_name}",
                         f"arn:aws:s3:::{bucket_name}/*",
                     ],
-                }
+                },
+                {
+                    # неподтвержденные прямые загрузки не раздаются
+                    "Sid": "DenyPendingUploads",
+                    "Effect": "Deny",
+                    "Principal": "*",
+                    "Action": ["s3:GetObject"],
+                    "Resource": [f"arn:aws:s3:::{bucket_name}/{PENDING_PREFIX}*"],
+                },
             ],
         }
         return json.dumps(policy)
@@ -217,12 +566,23 @@ class S3StorageManager:
     async def initialize_buckets(
         self,
     ):
-        async with self.s3client.client as s3conn:
-            for bucket_name in self.buckets:
-                if not await self.bucket_exists(bucket_name, s3conn):
-                    policy = self.make_public_policy(bucket_name)
-                    await self.create_bucket(bucket_name, policy, s3conn)
-            return "s3 buckets initialised"
+        s3conn = await s3client.get_client()
+        for bucket_name in self.buckets:
+            policy = self.make_public_policy(bucket_name)
+            if not await self.bucket_exists(bucket_name, s3conn):
+                await self.create_bucket(bucket_name, policy, s3conn)
+            else:
+                # политика обновляется и у существующих бакетов
+                await self.put_bucket_policy(bucket_name, policy, s3conn)
+        return "s3 buckets initialised"
+
+    async def put_bucket_policy(self, bucket_name: str, policy: str, s3conn) -> bool:
+        try:
+            await s3conn.put_bucket_policy(Bucket=bucket_name, Policy=policy)
+        except _client_error() as e:
+            print("Put bucket policy error:", e)
+            return False
+        return True
 
     async def create_bucket(self, bucket_name: str, policy: str, s3conn) -> bool:
         try:
@@ -230,7 +590,7 @@ class S3StorageManager:
             await s3conn.put_bucket_policy(Bucket=bucket_name, Policy=policy)
             print(f"Bucket {bucket_name} created")
             return True
-        except ClientError as e:
+        except _client_error() as e:
             print("Create bucket error:", e)
             return False
 
@@ -240,7 +600,7 @@ class S3StorageManager:
             if await s3conn.head_bucket(Bucket=bucket_name):
                 print(f"bucket {bucket_name} already exists")
                 return True
-        except ClientError as e:
+        except _client_error() as e:
             code = int(e.response["ResponseMetadata"]["HTTPStatusCode"])
             if code == 404:
                 return False
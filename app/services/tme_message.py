@@ -1,16 +1,14 @@
-import os
+from app.settings import settings
 
-from aiogram import Bot
-
-from dotenv import load_dotenv
-
-load_dotenv()
 
 async def send_message(post):
-    bot = Bot(token=os.getenv("BOT_TOKEN"))
+    # aiogram нужен только в воркере Celery, поэтому импортируется при первой отправке
+    from aiogram import Bot
+
+    bot = Bot(token=settings.bot_token)
 
     msg = await bot.send_message(
-        chat_id=int(os.getenv("CHAT_ID")),
+        chat_id=int(settings.chat_id),
         text=post
     )
     await bot.session.close()
@@ -18,9 +16,11 @@ async def send_message(post):
 
 
 async def delete_message(message_id):
-    bot = Bot(token=os.getenv("BOT_TOKEN"))
+    from aiogram import Bot
+
+    bot = Bot(token=settings.bot_token)
 
     await bot.delete_message(
-        chat_id=int(os.getenv("CHAT_ID")),
+        chat_id=int(settings.chat_id),
         message_id=message_id,
     )
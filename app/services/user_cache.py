@@ -0,0 +1,119 @@
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.api.users import crud as users_crud
+from app.conf.redis_client import get_redis_client
+from app.models import AvatarImage, User, UserRole
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = settings.user_cache_ttl
+# локальный слой не получает инвалидации из других воркеров, поэтому его TTL короче
+USER_CACHE_LOCAL_TTL = settings.user_cache_local_ttl
+USER_CACHE_LOCAL_SIZE = settings.user_cache_local_size
+# хеш пароля в кэш не попадает: он нужен только при смене данных пользователя
+# и читается из базы в user_service
+CACHED_FIELDS = ("user_id", "profile_image", "full_name", "login", "email", "role")
+
+_local: OrderedDict[uuid.UUID, tuple[float, dict]] = OrderedDict()
+
+
+def _user_key(user_id: uuid.UUID) -> str:
+    return f"user:{user_id}"
+
+
+def _local_get(user_id: uuid.UUID) -> dict | None:
+    entry = _local.get(user_id)
+    if entry is None:
+        return None
+    expires_at, data = entry
+    if expires_at <= time.monotonic():
+        del _local[user_id]
+        return None
+    _local.move_to_end(user_id)
+    return data
+
+
+def _local_put(user_id: uuid.UUID, data: dict) -> None:
+    if not USER_CACHE_LOCAL_SIZE:
+        return
+    _local[user_id] = (time.monotonic() + USER_CACHE_LOCAL_TTL, data)
+    _local.move_to_end(user_id)
+    while len(_local) > USER_CACHE_LOCAL_SIZE:
+        _local.popitem(last=False)
+
+
+def _to_user(data: dict) -> User:
+    """
+    Собирает отсоединенный от сессии объект User: каждый запрос получает свой экземпляр,
+    который можно изменить и добавить в сессию для UPDATE без повторного чтения из базы.
+    """
+    user = User(
+        user_id=uuid.UUID(data["user_id"]),
+        profile_image=data["profile_image"],
+        full_name=data["full_name"],
+        login=data["login"],
+        email=data["email"],
+        role=UserRole(data["role"]),
+    )
+    make_transient_to_detached(user)
+    # уменьшенные копии аватара, для srcset в ответах; не поле модели
+    user.profile_image_variants = data.get("profile_image_variants")
+    return user
+
+
+async def get_user(
+    user_id: uuid.UUID,
+    session: AsyncSession,
+) -> User:
+    """
+    Возвращает пользователя из кэша в памяти воркера, затем из Redis, и только при
+    промахе обоих слоев - из базы данных.
+    :raise HTTPException: 404, если пользователя нет
+    """
+    if data := _local_get(user_id):
+        return _to_user(data)
+    try:
+        cached = await get_redis_client().get(_user_key(user_id))
+    except RedisError as e:
+        logger.warning("user cache read failed: %s", e)
+        cached = None
+    if cached is not None:
+        data = json.loads(cached)
+        _local_put(user_id, data)
+        return _to_user(data)
+    user = await users_crud.get_user(user_id, session=session)
+    data = {field: getattr(user, field) for field in CACHED_FIELDS}
+    data["user_id"] = str(data["user_id"])
+    data["profile_image_variants"] = user.profile_image_variants = (
+        await session.scalar(select(AvatarImage.variants).where(AvatarImage.image_key == user.profile_image))
+        if user.profile_image else None
+    )
+    _local_put(user_id, data)
+    try:
+        await get_redis_client().set(_user_key(user_id), json.dumps(data), ex=USER_CACHE_TTL)
+    except RedisError as e:
+        logger.warning("user cache write failed: %s", e)
+    return user
+
+
+async def invalidate_user(user_id: uuid.UUID, client: Redis | None = None) -> None:
+    """
+    Удаляет пользователя из обоих слоев кэша. Вызывается после каждого изменения пользователя.
+    :param client: клиент Redis задачи Celery, у которой свой event loop на каждый запуск
+    """
+    _local.pop(user_id, None)
+    try:
+        await (client or get_redis_client()).delete(_user_key(user_id))
+    except RedisError as e:
+        logger.warning("user cache invalidation failed: %s", e)
@@ -1,4 +1,3 @@
-import os
 import re
 
 from argon2.exceptions import VerifyMismatchError
@@ -10,8 +9,11 @@ from starlette import status
 from app.api.auth.utils_jwt import hash_password, validate_password
 from app.api.users import schemas
 from app.api.images.crud import delete_image
-from app.services import create_image, S3ImageManager
-from app.models import User, db_helper, UserRole, AvatarImage
+from app.services import create_image, S3ImageManager, user_cache
+from app.services.image_refs import release_images
+from app.services.image_service import confirm_upload
+from app.models import User, db_helper, UserRole, AvatarImage, after_commit
+from app.settings import settings
 
 
 async def create_user(
@@ -37,15 +39,14 @@ async def create_user(
         )
     check_password_complexity(user_in.password)
     new_author = User(**user_in.model_dump(exclude={"profile_image"}))
-    new_author.password = hash_password(user_in.password)
+    new_author.password = await hash_password(user_in.password)
     session.add(new_author)
     await session.flush()
     if user_in.profile_image:
         storage = S3ImageManager("users-avatar-images", client)
         new_author.image = await create_image(user_in.profile_image, session, storage, new_author)
         new_author.profile_image = new_author.image.image_key
-    session.add(new_author)
-    await session.commit()
+    await session.flush()
     return new_author
 
 
@@ -56,9 +57,9 @@ async def user_update(
     client
 ):
     try:
-        validate_password(
+        await validate_password(
             password=user_in.password,
-            hashed_password=user.password,
+            hashed_password=await get_password_hash(user, session),
         )
     except VerifyMismatchError:
         raise HTTPException(
@@ -69,17 +70,48 @@ async def user_update(
         if field == "profile_image" and value:
             storage = S3ImageManager("users-avatar-images", client)
             if image_key := user.profile_image:
-                await storage.delete_object(image_key)
-                await delete_image(user.profile_image, session, AvatarImage)
+                await delete_image(image_key, session, user)
+                after_commit(session, release_images, storage, AvatarImage, [image_key])
             user.image = await create_image(user_in.profile_image, session, storage, user)
             setattr(user, field, user.image.image_key)
         elif value:
             setattr(user, field, value)
     session.add(user)
-    await session.commit()
+    await session.flush()
+    after_commit(session, user_cache.invalidate_user, user.user_id)
+    return user
+
+
+async def user_avatar_confirm(
+    upload_token: str,
+    user: User,
+    session: AsyncSession,
+    client,
+) -> User:
+    """
+    Делает изображение, загруженное напрямую в хранилище, аватаром пользователя.
+    Предыдущий аватар удаляется из хранилища после фиксации транзакции.
+    """
+    storage = S3ImageManager("users-avatar-images", client)
+    image = await confirm_upload(upload_token, user.user_id, session, storage, user)
+    if image_key := user.profile_image:
+        await delete_image(image_key, session, user)
+        after_commit(session, release_images, storage, AvatarImage, [image_key])
+    user.image = image
+    user.profile_image = image.image_key
+    session.add(user)
+    await session.flush()
+    after_commit(session, user_cache.invalidate_user, user.user_id)
     return user
 
 
+async def get_password_hash(user, session: AsyncSession) -> str:
+    """
+    Читает хеш пароля из базы: пользователь из кэша загружается без него.
+    """
+    return await session.scalar(select(User.password).where(User.user_id == user.user_id))
+
+
 def check_password_complexity(value):
     regex = r"^(?=.*?[A-Z])(?=.*?[a-z])(?=.*?[0-9])(?=.*?[#?!@$%^&*-]).*$"
     if not re.match(regex, value):
@@ -94,31 +126,32 @@ def check_password_complexity(value):
 async def user_password_update(user_password_in, user, session: AsyncSession):
     check_password_complexity(user_password_in.new_password)
     try:
-        validate_password(
+        await validate_password(
             password=user_password_in.current_password,
-            hashed_password=user.password,
+            hashed_password=await get_password_hash(user, session),
         )
     except VerifyMismatchError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="unauthorized",
         )
-    user.password = hash_password(user_password_in.new_password)
+    user.password = await hash_password(user_password_in.new_password)
     session.add(user)
-    await session.commit()
+    await session.flush()
+    after_commit(session, user_cache.invalidate_user, user.user_id)
     return user
 
 
 async def administrator_create():
     async with db_helper.session_factory() as session:
-        stmt = select(User).filter(User.login == os.getenv("ADMIN_LOGIN"))
+        stmt = select(User).filter(User.login == settings.admin_login)
         admin = await session.execute(stmt)
         if not admin.scalar_one_or_none():
             new_admin = User(
                 full_name="administrator",
-                login=os.getenv("ADMIN_LOGIN"),
+                login=settings.admin_login,
                 email="admin@example.com",
-                password=hash_password(os.getenv("ADMIN_PASSWORD")),
+                password=await hash_password(settings.admin_password),
                 role=UserRole.admin,
             )
             session.add(new_admin)
@@ -1,7 +1,107 @@
 import os
-from dotenv import load_dotenv
 
+from dotenv import load_dotenv
 
-dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..\..\.env"))
+# .env в корне проекта читается один раз, при первом импорте настроек;
+# переменные окружения процесса имеют приоритет над .env
+dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env"))
 if os.path.exists(dotenv_path):
     load_dotenv(dotenv_path)
+
+
+def _bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+def _list(name: str) -> list[str]:
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+class Settings:
+    """
+    Настройки приложения из переменных окружения. Описание переменных - в .env.example.
+    """
+
+    def __init__(self):
+        # сервис: токены, хеширование паролей, ограничение попыток входа
+        self.secret_key = os.getenv("SECRET_KEY")
+        self.access_token_expire = int(os.getenv("ACCESS_TOKEN_EXPIRE", 7))
+        self.refresh_token_expire = int(os.getenv("REFRESH_TOKEN_EXPIRE", 15))
+        self.auth_token_cache_size = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+        self.password_hash_concurrency = int(os.getenv("PASSWORD_HASH_CONCURRENCY", 2))
+        self.password_hash_max_queue = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+        self.login_rate_limit_login_burst = int(os.getenv("LOGIN_RATE_LIMIT_LOGIN_BURST", 5))
+        self.login_rate_limit_login_per_minute = float(os.getenv("LOGIN_RATE_LIMIT_LOGIN_PER_MINUTE", 5))
+        self.login_rate_limit_ip_burst = int(os.getenv("LOGIN_RATE_LIMIT_IP_BURST", 20))
+        self.login_rate_limit_ip_per_minute = float(os.getenv("LOGIN_RATE_LIMIT_IP_PER_MINUTE", 20))
+        self.trusted_proxies = _list("TRUSTED_PROXIES") or ["127.0.0.1"]
+
+        # администратор
+        self.admin_login = os.getenv("ADMIN_LOGIN")
+        self.admin_password = os.getenv("ADMIN_PASSWORD")
+
+        # база данных
+        self.db_host = os.getenv("DB_HOST")
+        self.db_port = os.getenv("DB_PORT")
+        self.db_name = os.getenv("DB_NAME")
+        self.db_user = os.getenv("DB_USER")
+        self.db_pass = os.getenv("DB_PASS")
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", 5))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 10))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", 30))
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", 1800))
+        self.db_pool_pre_ping = _bool("DB_POOL_PRE_PING")
+        self.db_statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+        self.db_replica_urls = _list("DB_REPLICA_URLS")
+        self.db_replica_health_interval = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", 5))
+        self.db_read_your_writes_seconds = int(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
+
+        # хранилище S3 и загрузка изображений
+        self.minio_host = os.getenv("MINIO_HOST")
+        self.minio_port = os.getenv("MINIO_PORT")
+        self.minio_access_key = os.getenv("MINIO_ACCESS_KEY")
+        self.minio_secret_key = os.getenv("MINIO_SECRET_KEY")
+        self.minio_use_ssl = _bool("MINIO_USE_SSL")
+        self.s3_max_pool_connections = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+        self.s3_connect_timeout = float(os.getenv("S3_CONNECT_TIMEOUT", 5))
+        self.s3_read_timeout = float(os.getenv("S3_READ_TIMEOUT", 60))
+        self.s3_max_attempts = int(os.getenv("S3_MAX_ATTEMPTS", 3))
+        # S3 не принимает части multipart upload меньше 5 МиБ (кроме последней)
+        self.upload_chunk_size = max(int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)), 5 * 1024 * 1024)
+        self.upload_max_size = int(os.getenv("UPLOAD_MAX_SIZE", 20 * 1024 * 1024))
+        self.upload_image_types = _list("UPLOAD_IMAGE_TYPES") or ["image/jpeg", "image/png", "image/webp", "image/gif"]
+        self.upload_url_expire = int(os.getenv("UPLOAD_URL_EXPIRE", 600))
+        self.upload_token_expire = int(os.getenv("UPLOAD_TOKEN_EXPIRE", 3600))
+        # уменьшенные копии изображений: название -> ширина в пикселях
+        self.image_variants = {
+            name.strip(): int(width)
+            for name, width in (item.split(":") for item in _list("IMAGE_VARIANTS"))
+        } or {"thumbnail": 320, "card": 800, "full": 1600}
+        self.image_variant_format = os.getenv("IMAGE_VARIANT_FORMAT", "webp").lower()
+        self.image_variant_quality = int(os.getenv("IMAGE_VARIANT_QUALITY", 80))
+
+        # Redis и кэши
+        self.redis_host = os.getenv("REDIS_HOST")
+        self.redis_port = int(os.getenv("REDIS_PORT", 6379))
+        self.redis_pass = os.getenv("REDIS_PASS")
+        self.redis_cache_db = int(os.getenv("REDIS_CACHE_DB", 1))
+        self.redis_socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
+        self.post_cache_ttl = int(os.getenv("POST_CACHE_TTL", 300))
+        self.post_cache_replica_delay = float(os.getenv("POST_CACHE_REPLICA_DELAY", 2))
+        self.user_cache_ttl = int(os.getenv("USER_CACHE_TTL", 60))
+        self.user_cache_local_ttl = float(os.getenv("USER_CACHE_LOCAL_TTL", 5))
+        self.user_cache_local_size = int(os.getenv("USER_CACHE_LOCAL_SIZE", 10000))
+
+        # интеграция с Telegram
+        self.bot_token = os.getenv("BOT_TOKEN")
+        self.chat_id = os.getenv("CHAT_ID")
+
+        # фронтенд
+        self.next_public_site_url = os.getenv("NEXT_PUBLIC_SITE_URL")
+
+    @property
+    def celery_broker_url(self) -> str:
+        return f"redis://:{self.redis_pass}@{self.redis_host}:{self.redis_port}/0"
+
+
+settings = Settings()
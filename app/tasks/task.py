@@ -1,29 +1,58 @@
 import asyncio
-import os
+from functools import cache
 
+from botocore.exceptions import BotoCoreError, ClientError
 from celery import Celery
 from celery.schedules import crontab
-from dotenv import load_dotenv
 from redis import Redis
+from redis.exceptions import RedisError
 import redis_lock
+from sqlalchemy.exc import SQLAlchemyError
 
-from app.services.image_service import delete_images_without_post
+from app.api.auth.crud import purge_expired_jwt_sessions
+from app.services.image_service import delete_images_without_post, delete_expired_pending_uploads
+from app.services.image_variants import generate_variants
+from app.services.feed_index import rebuild_feed_index
 from app.services.tme_message import send_message
+from app.models import db_helper
+from app.settings import settings
 
-load_dotenv()
-redis_client = Redis(
-    host=os.getenv("REDIS_HOST"),
-    port=int(os.getenv("REDIS_PORT")),
-    password=os.getenv("REDIS_PASS"),
-)
 lock_key = "my_task_lock"
 
 celery_app = Celery(
     main="task",
-    broker=f"redis://:{os.getenv("REDIS_PASS")}@{os.getenv("REDIS_HOST")}:{os.getenv("REDIS_PORT")}/0",
+    broker=settings.celery_broker_url,
 )
 
 
+@cache
+def get_lock_client() -> Redis:
+    """
+    Синхронный клиент Redis для блокировок задач, создается при первом запуске задачи.
+    """
+    return Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        password=settings.redis_pass,
+    )
+
+
+def run_async(coroutine_function, *args):
+    """
+    Выполняет корутину задачи в новом event loop: asyncio.run на каждый запуск.
+    Соединения asyncpg привязаны к loop, в котором открыты, поэтому после выполнения
+    пул соединений закрывается, и следующий запуск в этом воркере открывает свои.
+    """
+
+    async def run():
+        try:
+            return await coroutine_function(*args)
+        finally:
+            await db_helper.engine.dispose()
+
+    return asyncio.run(run())
+
+
 @celery_app.task(
     name="app.tasks.task.delete_images_without_post_task",
     bind=True,
@@ -31,19 +60,45 @@ celery_app = Celery(
     acks_late=True,
 )
 def delete_images_without_post_task(self):
-    lock = redis_lock.Lock(redis_client, lock_key, expire=60)
+    lock = redis_lock.Lock(get_lock_client(), lock_key, expire=60)
     # TODO: что это разобраться
     if not lock.acquire(blocking=False):
         self.retry(countdown=10)
         return
     try:
-        result = asyncio.run(delete_images_without_post())
+        result = run_async(delete_images_without_post)
         return result
     except Exception as e:
         # Логируем ошибку и пробуем повторить
         self.retry(exc=e, countdown=300)
 
 
+@celery_app.task(
+    name="app.tasks.task.delete_expired_pending_uploads_task",
+    bind=True,
+    max_retries=3,
+    acks_late=True,
+)
+def delete_expired_pending_uploads_task(self):
+    try:
+        return run_async(delete_expired_pending_uploads)
+    except (ClientError, BotoCoreError, OSError) as e:
+        self.retry(exc=e, countdown=300)
+
+
+@celery_app.task(
+    name="app.tasks.task.purge_expired_jwt_sessions_task",
+    bind=True,
+    max_retries=3,
+    acks_late=True,
+)
+def purge_expired_jwt_sessions_task(self):
+    try:
+        return run_async(purge_expired_jwt_sessions)
+    except (SQLAlchemyError, OSError) as e:
+        self.retry(exc=e, countdown=300)
+
+
 @celery_app.task(
     name="app.tasks.task.send_message_task",
     bind=True,
@@ -51,7 +106,7 @@ def delete_images_without_post_task(self):
     acks_late=True,
 )
 def send_message_task(self, content):
-    lock = redis_lock.Lock(redis_client, lock_key, expire=60)
+    lock = redis_lock.Lock(get_lock_client(), lock_key, expire=60)
     if not lock.acquire(blocking=False):
         self.retry(countdown=10)
         return
@@ -76,7 +131,7 @@ def send_message_task(self, content):
     acks_late=True,
 )
 def send_message_task(self, content):
-    lock = redis_lock.Lock(redis_client, lock_key, expire=60)
+    lock = redis_lock.Lock(get_lock_client(), lock_key, expire=60)
     if not lock.acquire(blocking=False):
         self.retry(countdown=10)
         return
@@ -93,10 +148,48 @@ def send_message_task(self, content):
             pass
 
 
+@celery_app.task(
+    name="app.tasks.task.rebuild_feed_index_task",
+    bind=True,
+    max_retries=3,
+    acks_late=True,
+)
+def rebuild_feed_index_task(self):
+    try:
+        return run_async(rebuild_feed_index)
+    except (RedisError, SQLAlchemyError, OSError) as e:
+        self.retry(exc=e, countdown=300)
+
+
+@celery_app.task(
+    name="app.tasks.task.generate_image_variants_task",
+    bind=True,
+    max_retries=3,
+    acks_late=True,
+)
+def generate_image_variants_task(self, bucket_name, image_key):
+    try:
+        return run_async(generate_variants, bucket_name, image_key)
+    except (ClientError, BotoCoreError, RedisError, SQLAlchemyError, OSError) as e:
+        self.retry(exc=e, countdown=60)
+
+
 celery_app.conf.timezone = "Europe/Moscow"
 celery_app.conf.beat_schedule = {
     "task-name": {
         "task": "app.tasks.task.delete_images_without_post_task",
         "schedule": crontab(hour=2, minute=00),  # Раз в день в 2.00
     },
+    "delete-expired-pending-uploads": {
+        "task": "app.tasks.task.delete_expired_pending_uploads_task",
+        "schedule": crontab(minute=15),  # Раз в час
+    },
+    "purge-expired-jwt-sessions": {
+        "task": "app.tasks.task.purge_expired_jwt_sessions_task",
+        "schedule": crontab(minute=30),  # Раз в час
+    },
+    "rebuild-feed-index": {
+        "task": "app.tasks.task.rebuild_feed_index_task",
+        "schedule": crontab(hour=3, minute=00),  # исправление расхождений индекса ленты
+    },
 }
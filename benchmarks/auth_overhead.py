@@ -0,0 +1,76 @@
+"""
+Накладные расходы AuthMiddleware на запрос: с кэшем проверенных токенов и без него.
+
+Middleware оборачивает пустой обработчик, запросы выполняются в процессе через
+httpx.ASGITransport, поэтому в результат не входят сеть и база данных.
+
+    uv run python -m benchmarks.auth_overhead --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-sufficient-length")
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.api.auth.token_cache import VerifiedTokenCache
+from app.api.auth.utils_jwt import create_access_token
+from app.middleware import AuthMiddleware
+
+
+class _User:
+    user_id = uuid.uuid4()
+    role = "author"
+
+
+async def _endpoint(_request):
+    return PlainTextResponse("ok")
+
+
+def build_app(token_cache: VerifiedTokenCache | None):
+    application = Starlette(routes=[Route("/api/v1/posts/get_posts", _endpoint)])
+    if token_cache is None:
+        return application
+    application.add_middleware(AuthMiddleware, token_cache=token_cache)
+    return application
+
+
+async def measure(application, headers: dict, requests: int) -> float:
+    transport = httpx.ASGITransport(app=application)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/api/v1/posts/get_posts", headers=headers)
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/api/v1/posts/get_posts", headers=headers)
+            response.raise_for_status()
+        return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def main(requests: int):
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE", "15")
+    headers = {"Authorization": f"Bearer {create_access_token(_User())}"}
+    baseline = await measure(build_app(None), headers, requests)
+    uncached_cache = VerifiedTokenCache(maxsize=0)
+    uncached = await measure(build_app(uncached_cache), headers, requests)
+    cache = VerifiedTokenCache(maxsize=10000)
+    cached = await measure(build_app(cache), headers, requests)
+    print(f"no middleware:            {baseline:8.1f} us/request")
+    print(f"AuthMiddleware, no cache: {uncached:8.1f} us/request "
+          f"(auth overhead {uncached - baseline:6.1f} us)")
+    print(f"AuthMiddleware, cache:    {cached:8.1f} us/request "
+          f"(auth overhead {cached - baseline:6.1f} us)")
+    print(f"cache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,107 @@
+"""
+Пропускная способность GET /api/v1/posts/get_posts с AuthMiddleware на чистом ASGI
+и с прежней реализацией на BaseHTTPMiddleware.
+
+Запросы выполняются в процессе через httpx.ASGITransport к настоящим роутерам
+приложения, поэтому нужны база данных и Redis из .env (docker compose dev-стек):
+
+    uv run python -m benchmarks.get_posts_throughput --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+import jwt
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPBearer
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.api.auth.token_cache import VerifiedTokenCache, token_cache
+from app.api.auth.utils_jwt import create_access_token, decode_jwt
+from app.api.posts.views import router as posts_router
+from app.conf.s3_client import s3client
+from app.middleware import AuthMiddleware
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    """
+    Прежняя реализация AuthMiddleware (с кэшем токенов), для сравнения.
+    """
+
+    def __init__(self, app, token_cache: VerifiedTokenCache = token_cache):
+        super().__init__(app)
+        self._required_auth = HTTPBearer(auto_error=False)
+        self._token_cache = token_cache
+
+    async def dispatch(self, request: Request, call_next):
+        token = await self._required_auth(request)
+        if token:
+            try:
+                if not (claims := self._token_cache.get(token.credentials)):
+                    payload = decode_jwt(token.credentials)
+                    claims = uuid.UUID(payload.get("sub")), payload.get("role")
+                    self._token_cache.put(token.credentials, *claims, payload["exp"])
+                request.state.user_id, request.state.user_role = claims
+            except jwt.InvalidTokenError:
+                return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+        else:
+            request.state.user_id = None
+            request.state.user_role = None
+        return await call_next(request)
+
+
+class _User:
+    user_id = uuid.uuid4()
+    role = "author"
+
+
+def build_app(middleware) -> FastAPI:
+    application = FastAPI()
+    application.add_middleware(middleware, token_cache=VerifiedTokenCache(maxsize=1000))
+    application.include_router(posts_router, prefix="/api/v1")
+    return application
+
+
+async def measure(application, requests: int, concurrency: int, url: str) -> float:
+    headers = {"Authorization": f"Bearer {create_access_token(_User())}"}
+    transport = httpx.ASGITransport(app=application)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(requests))
+
+        async def worker():
+            for _ in queue:
+                response = await client.get(url, headers=headers)
+                if response.status_code >= 500:
+                    response.raise_for_status()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency // 2 or 1)))
+        queue = iter(range(requests))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main(requests: int, concurrency: int, url: str):
+    # ASGITransport не выполняет lifespan, поэтому общий клиент S3 открывается здесь
+    await s3client.start()
+    try:
+        for name, middleware in (
+            ("BaseHTTPMiddleware", LegacyAuthMiddleware),
+            ("pure ASGI", AuthMiddleware),
+        ):
+            rps = await measure(build_app(middleware), requests, concurrency, url)
+            print(f"{name:20} {rps:8.1f} requests/s")
+    finally:
+        await s3client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--url", default="/api/v1/posts/get_posts?fields=summary")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.url))
@@ -0,0 +1,70 @@
+"""
+Проверка времени холодного импорта приложения: импорт app.main не должен открывать
+соединения и импортировать клиентов (aioboto3, Celery, aiogram), нужных только позже.
+
+Импорт выполняется в отдельных процессах с -X importtime, берется лучший результат.
+Если он превышает бюджет, печатаются самые медленные модули и скрипт завершается с кодом 1,
+поэтому его можно запускать в CI:
+
+    uv run python -m benchmarks.import_time --budget-ms 600
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+MODULE = "app.main"
+DEFAULT_BUDGET_MS = 600
+# клиенты, которые импортируются только при первом обращении
+LAZY_MODULES = ("aioboto3", "botocore", "celery", "aiogram", "PIL")
+
+
+def measure(module: str) -> dict[str, int]:
+    """
+    :return: суммарное время импорта каждого модуля (с вложенными), в микросекундах
+    """
+    # запускается текущий интерпретатор с фиксированными аргументами, module - имя модуля
+    # из кода проверки, а не внешний ввод
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def best_of(runs: int) -> dict[str, int]:
+    """
+    :return: замер с наименьшим временем импорта приложения из runs запусков
+    """
+    return min((measure(MODULE) for _ in range(runs)), key=lambda timings: timings[MODULE])
+
+
+def main(budget_ms: float, runs: int, top: int) -> int:
+    best = best_of(runs)
+    total_ms = best[MODULE] / 1000
+    print(f"import {MODULE}: {total_ms:.0f} ms (budget {budget_ms:.0f} ms, best of {runs})")
+    if total_ms <= budget_ms:
+        return 0
+    print("slowest modules (cumulative):")
+    for name, cumulative in sorted(best.items(), key=lambda item: item[1], reverse=True)[1:top + 1]:
+        print(f"{cumulative / 1000:8.1f} ms  {name}")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    sys.exit(main(args.budget_ms, args.runs, args.top))
@@ -0,0 +1,15 @@
+import pytest
+
+from benchmarks.import_time import DEFAULT_BUDGET_MS, LAZY_MODULES, MODULE, best_of
+
+
+@pytest.mark.benchmark
+def test_import_app_within_budget():
+    timings = best_of(runs=3)
+    assert timings[MODULE] / 1000 <= DEFAULT_BUDGET_MS
+
+
+def test_import_app_does_not_load_clients():
+    timings = best_of(runs=1)
+    loaded = {name.split(".")[0] for name in timings}
+    assert not loaded & set(LAZY_MODULES)
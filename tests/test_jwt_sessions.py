@@ -0,0 +1,91 @@
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from starlette.requests import Request
+
+from app.api.auth.crud import create_jwt_session, update_jwt_session
+from app.api.auth.utils_jwt import create_refresh_token, decode_jwt
+from app.settings import settings
+
+
+class FakeUser:
+    user_id = uuid.uuid4()
+
+
+class FakeSession:
+    """
+    Сессия, которая запоминает выполненные запросы вместо обращения к базе.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def scalar(self, statement):
+        self.statements.append(statement)
+        return 1
+
+    async def commit(self):
+        return None
+
+    async def close(self):
+        return None
+
+
+@pytest.fixture(autouse=True)
+def local_timezone(monkeypatch):
+    # часовой пояс сервера западнее UTC: локальное время отстает от UTC на часы
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture(autouse=True)
+def secret_key(monkeypatch):
+    monkeypatch.setattr(settings, "secret_key", "test-secret-key-of-at-least-32-bytes")
+
+
+def written_values(statement) -> dict:
+    return statement.compile(dialect=postgresql.dialect()).params
+
+
+def expected_expiry(token: str) -> datetime:
+    return datetime.fromtimestamp(decode_jwt(token)["exp"], UTC).replace(tzinfo=None)
+
+
+def assert_utc(values: dict, token: str) -> None:
+    now = datetime.now(UTC).replace(tzinfo=None)
+    assert abs(values["created_at"] - now) < timedelta(minutes=1)
+    assert values["expires_in"] == expected_expiry(token)
+
+
+async def test_create_jwt_session_writes_utc():
+    session = FakeSession()
+    refresh = create_refresh_token(FakeUser)
+
+    await create_jwt_session(FakeUser, refresh, session)
+
+    assert_utc(written_values(session.statements[0]), refresh)
+
+
+async def test_update_jwt_session_writes_utc():
+    session = FakeSession()
+    current = create_refresh_token(FakeUser)
+    refresh = create_refresh_token(FakeUser)
+    request = Request(
+        {
+            "type": "http",
+            "headers": [(b"cookie", f"refresh_token={current}".encode())],
+        }
+    )
+
+    await update_jwt_session(refresh, request, session)
+
+    assert_utc(written_values(session.statements[0]), refresh)
@@ -0,0 +1,165 @@
+import uuid
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import Post
+from app.services import image_service
+from app.services.s3_services import PENDING_PREFIX, S3ImageManager
+from app.settings import settings
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+BUCKET = "post-illustration-images"
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self) -> bytes:
+        return self.data
+
+
+class FakePaginator:
+    def __init__(self, objects: dict):
+        self.objects = objects
+
+    async def paginate(self, **params):
+        yield {
+            "Contents": [
+                {"Key": key, "LastModified": obj["LastModified"]}
+                for key, obj in self.objects.items()
+                if key.startswith(params["Prefix"])
+            ]
+        }
+
+
+class FakeS3Client:
+    """
+    Бакет в памяти: объекты хранятся с ACL и временем изменения.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def put(self, key: str, data: bytes, acl: str = "private", age: timedelta = timedelta()):
+        self.objects[key] = {"Body": data, "ACL": acl, "LastModified": datetime.now(UTC) - age}
+
+    async def generate_presigned_post(self, **params):
+        return {"url": "http://minio", "fields": {**params["Fields"], "key": params["Key"]}}
+
+    async def head_object(self, **params):
+        from botocore.exceptions import ClientError
+
+        if params["Key"] not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[params["Key"]]["Body"])}
+
+    async def get_object(self, **params):
+        return {"Body": FakeBody(self.objects[params["Key"]]["Body"])}
+
+    async def copy_object(self, **params):
+        source = self.objects[params["CopySource"]["Key"]]
+        self.objects[params["Key"]] = {
+            **source,
+            "ACL": params["ACL"],
+            "ContentType": params["ContentType"],
+        }
+
+    async def delete_object(self, **params):
+        self.objects.pop(params["Key"], None)
+
+    async def delete_objects(self, **params):
+        for obj in params["Delete"]["Objects"]:
+            self.objects.pop(obj["Key"], None)
+
+    def get_paginator(self, _name: str) -> FakePaginator:
+        return FakePaginator(self.objects)
+
+
+class FakeSession:
+    def __init__(self):
+        self.info = {}
+        self.added = []
+
+    async def execute(self, _statement):
+        return None
+
+    async def scalar(self, _statement):
+        return None
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def flush(self):
+        return None
+
+
+@pytest.fixture
+def client() -> FakeS3Client:
+    return FakeS3Client()
+
+
+@pytest.fixture
+def storage(client) -> S3ImageManager:
+    return S3ImageManager(BUCKET, client)
+
+
+@pytest.fixture
+def post() -> Post:
+    return Post(post_id=uuid.uuid4())
+
+
+@pytest.fixture(autouse=True)
+def secret_key(monkeypatch):
+    monkeypatch.setattr(settings, "secret_key", "test-secret-key-of-at-least-32-bytes")
+
+
+async def test_upload_url_points_to_private_pending_key(storage, post):
+    upload = await image_service.create_upload_url("photo.png", "image/png", uuid.uuid4(), storage, post)
+
+    assert upload["image_key"].startswith(PENDING_PREFIX)
+    assert upload["fields"]["key"] == upload["image_key"]
+    assert upload["fields"]["acl"] == "private"
+
+
+async def test_confirm_publishes_pending_upload(client, storage, post):
+    user_id = uuid.uuid4()
+    upload = await image_service.create_upload_url("photo.png", "image/png", user_id, storage, post)
+    client.put(upload["image_key"], PNG)
+    session = FakeSession()
+
+    image = await image_service.confirm_upload(upload["upload_token"], user_id, session, storage, post)
+
+    assert image.image_key == upload["image_key"].removeprefix(PENDING_PREFIX)
+    assert client.objects[image.image_key]["ACL"] == "public-read"
+    assert client.objects[image.image_key]["ContentType"] == "image/png"
+
+
+async def test_confirm_without_upload_is_not_found(storage, post):
+    user_id = uuid.uuid4()
+    upload = await image_service.create_upload_url("photo.png", "image/png", user_id, storage, post)
+
+    with pytest.raises(HTTPException) as error:
+        await image_service.confirm_upload(upload["upload_token"], user_id, FakeSession(), storage, post)
+
+    assert error.value.status_code == 404
+
+
+async def test_unconfirmed_uploads_expire(client, storage):
+    max_age = settings.upload_token_expire
+    client.put(f"{PENDING_PREFIX}expired.png", PNG, age=timedelta(seconds=max_age + 60))
+    client.put(f"{PENDING_PREFIX}fresh.png", PNG)
+    client.put("published.png", PNG, acl="public-read", age=timedelta(seconds=max_age + 60))
+
+    deleted = await storage.delete_expired_pending(max_age)
+
+    assert deleted == 1
+    assert set(client.objects) == {f"{PENDING_PREFIX}fresh.png", "published.png"}
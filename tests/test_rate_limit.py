@@ -0,0 +1,46 @@
+from ipaddress import ip_network
+
+import pytest
+from starlette.requests import Request
+
+from app.api.auth.rate_limit import client_ip
+
+PROXIES = (ip_network("127.0.0.1/32"), ip_network("172.18.0.0/16"))
+
+
+def make_request(host: str | None, forwarded: list[str] = ()) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/api/v1/auth/login",
+            "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded],
+            "client": (host, 50000) if host else None,
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    ("host", "forwarded", "expected"),
+    [
+        # прямое подключение: заголовок игнорируется, его мог выставить сам клиент
+        ("203.0.113.7", ["198.51.100.1"], "203.0.113.7"),
+        # за прокси берется адрес, добавленный прокси
+        ("172.18.0.5", ["198.51.100.1"], "198.51.100.1"),
+        # адреса левее подставлены клиентом и не учитываются
+        ("172.18.0.5", ["10.0.0.1, 192.0.2.10", "198.51.100.1"], "198.51.100.1"),
+        # цепочка доверенных прокси пропускается
+        ("127.0.0.1", ["198.51.100.1, 172.18.0.5"], "198.51.100.1"),
+        # прокси без заголовка - ограничение по адресу прокси
+        ("172.18.0.5", [], "172.18.0.5"),
+        (None, [], "unknown"),
+    ],
+)
+def test_client_ip(host, forwarded, expected):
+    assert client_ip(make_request(host, forwarded), PROXIES) == expected
+
+
+def test_clients_behind_proxy_get_separate_buckets():
+    first = client_ip(make_request("172.18.0.5", ["198.51.100.1"]), PROXIES)
+    second = client_ip(make_request("172.18.0.5", ["198.51.100.2"]), PROXIES)
+    assert first != second